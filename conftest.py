@@ -0,0 +1 @@
+# Puts the repository root on sys.path, so tests import grocery_god as a namespace package
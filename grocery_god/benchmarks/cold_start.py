@@ -0,0 +1,113 @@
+"""
+Checks the Lambda handler's import time against a cold-start budget.
+
+Imports grocery_god.pipelines.safeway_lambda in fresh interpreters with
+`-X importtime`, prints the slowest modules, and exits non-zero when the best
+import time is over budget or when a deferred heavy module (boto3, Playwright,
+pandas) was imported anyway. Meant for CI and for the image build, so a new
+top-level import on the handler path is caught before it ships;
+tests/test_cold_start.py runs the same check under pytest.
+
+Functions:
+    import_once(module: str = HANDLER_MODULE) -> tuple[dict, list]: One fresh-interpreter import and its -X importtime rows.
+    check(module: str = HANDLER_MODULE, budget: float = BUDGET_S, repeat: int = 5) -> tuple[dict, list, list[str]]:
+        Best of `repeat` imports, its rows, and the budget and deferred-import failures.
+
+Usage:
+    python -m grocery_god.benchmarks.cold_start --budget 0.15 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+HANDLER_MODULE = "grocery_god.pipelines.safeway_lambda"
+DEFERRED_MODULES = ("boto3", "botocore", "playwright", "pandas", "numpy", "supabase")
+BUDGET_S = 0.15
+
+# grocery_god is a namespace package, importable from the repository root
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+# Separates interpreter startup (site, encodings) from the import being measured
+MARKER = "-- cold start probe --"
+
+PROBE = """
+import json, sys, time
+print("{marker}", file=sys.stderr, flush=True)
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "modules": sorted(sys.modules)}}))
+"""
+
+
+def import_once(module: str = HANDLER_MODULE) -> tuple[dict, list[tuple[str, int, int]]]:
+    """Imports `module` in a fresh interpreter; returns the probe result and the -X importtime rows."""
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT), env.get("PYTHONPATH")]))
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, marker=MARKER)],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    )
+
+    # Rows look like "import time:       123 |        456 |   package.module"
+    rows = []
+    lines = proc.stderr.splitlines()
+    for line in lines[lines.index(MARKER) + 1:]:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+
+    return json.loads(proc.stdout.splitlines()[-1]), rows
+
+
+def check(
+    module: str = HANDLER_MODULE, budget: float = BUDGET_S, repeat: int = 5
+) -> tuple[dict, list[tuple[str, int, int]], list[str]]:
+
+    runs = [import_once(module) for _ in range(repeat)]
+    probe, rows = min(runs, key=lambda run: run[0]["seconds"])
+
+    failures = []
+    if probe["seconds"] > budget:
+        failures.append(f"import took {probe['seconds']:.3f}s, over the {budget:.3f}s budget")
+
+    imported = {name.split(".")[0] for name in probe["modules"]}
+    for name in DEFERRED_MODULES:
+        if name in imported:
+            failures.append(f"{name} is imported at handler import time; defer it to first use")
+
+    return probe, rows, failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default=HANDLER_MODULE)
+    parser.add_argument("--budget", type=float, default=BUDGET_S, help="seconds")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    probe, rows, failures = check(args.module, args.budget, args.repeat)
+
+    print(f"{args.module}: best of {args.repeat} imports {probe['seconds']:.3f}s (budget {args.budget:.3f}s)")
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1e6:>11.4f}s {self_us / 1e6:>9.4f}s  {name}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""
+Benchmarks the row-by-row `sort_data` loop against `sort_data_vectorized`.
+
+Builds a seeded batch of Safeway-style aria-labels (see benchmarks.synthetic), checks that both modes
+produce the same rows, and prints the best-of-N wall time for each.
+
+Usage:
+    python -m grocery_god.benchmarks.sort_data --rows 100000 --repeat 3
+"""
+
+import argparse
+import time
+
+import pandas as pd
+
+from grocery_god.benchmarks.synthetic import make_labels
+from grocery_god.parsing.parser import sort_data
+
+
+def time_mode(raw_data: pd.Series, vectorized: bool, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        sort_data(raw_data, vectorized=vectorized)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    raw_data = make_labels(args.rows, args.seed)
+
+    if sort_data(raw_data) != sort_data(raw_data, vectorized=True):
+        raise SystemExit("Vectorized output does not match the loop output.")
+
+    loop_s = time_mode(raw_data, vectorized=False, repeat=args.repeat)
+    vec_s = time_mode(raw_data, vectorized=True, repeat=args.repeat)
+
+    print(f"rows:       {args.rows:,}")
+    print(f"loop:       {loop_s:.3f}s ({args.rows / loop_s:,.0f} rows/s)")
+    print(f"vectorized: {vec_s:.3f}s ({args.rows / vec_s:,.0f} rows/s)")
+    print(f"speedup:    {loop_s / vec_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Per-stage benchmarks of the parse and clean pipeline, with stored baselines.
+
+Each stage (sort_data and setup_df in both modes, clean_price_column, clean_deal_column
+and clean_data in both output modes) runs on the same seeded synthetic flyer. Wall
+time is the median of --repeat runs and is reported as rows/s, along with the runs'
+spread (median absolute deviation over the median). Peak memory is the tracemalloc
+peak of one extra run, so it covers Python, NumPy and pandas buffers. Arrow's memory
+pool is invisible to tracemalloc, so the stages that go through Arrow
+(ARROW_STAGES) also report rss_mb: how far one run lifts the peak RSS of a fresh
+interpreter above its RSS at the start of the run (Linux only).
+
+--save writes the results to baselines.json next to this file. --check compares a
+run with the stored baselines and exits non-zero when a stage loses more than
+--threshold of its throughput or grows its memory by more than --threshold. Short
+stages are noisy, so a stage's threshold widens to NOISE_FACTOR times its spread
+(in the baseline or the run, whichever is larger) when that is wider, and memory
+may grow by MEMORY_SLACK_MB regardless of the threshold. Baselines are
+only comparable on the machine and Python version that recorded them, so re-record
+them (--save) when either changes.
+
+Functions:
+    run_stages(rows: int, seed: int = 0, repeat: int = 7, stages: list[str] | None = None) -> dict:
+        Runs and measures the stages; returns {stage: {"seconds", "rows_per_s", "spread", "peak_mb"[, "rss_mb"]}}.
+    compare(results: dict, baselines: dict, threshold: float) -> list[str]: Regressions past threshold.
+
+Usage:
+    python -m grocery_god.benchmarks.stages --rows 50000 --save
+    python -m grocery_god.benchmarks.stages --rows 50000 --check --threshold 0.2
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+from grocery_god.benchmarks.synthetic import make_labels, write_flyer
+from grocery_god.cleaning.cleaner import clean_data, clean_deal_column, clean_price_column
+from grocery_god.parsing.parser import setup_df, sort_data
+
+BASELINES_PATH = Path(__file__).with_name("baselines.json")
+
+# Stages whose buffers live in Arrow's memory pool rather than on the Python heap
+ARROW_STAGES = ("sort_data_vectorized", "setup_df_vectorized", "clean_data_typed")
+
+# A stage's threshold is at least this many times its relative spread
+NOISE_FACTOR = 3
+
+# Memory growth below this is allocator and page granularity, not a regression
+MEMORY_SLACK_MB = 4.0
+
+
+def _sorted_frame(raw_data: pd.Series) -> pd.DataFrame:
+    products, deals, prices = sort_data(raw_data)
+    return pd.DataFrame({"product": products, "deal": deals, "price": prices})
+
+
+def _clean_input(sorted_df: pd.DataFrame) -> pd.DataFrame:
+    # The columns clean_data initializes before its stages run
+    df = sorted_df.copy()
+    df["units"] = 1
+    df["unit_price"] = None
+    df["ounces"] = None
+    return df
+
+
+def _stages(raw_data: pd.Series, flyer_path: str) -> dict:
+    """Stage name -> (setup, run). setup builds a fresh input outside the timed region."""
+
+    sorted_df = _sorted_frame(raw_data)
+    price_df = clean_price_column(_clean_input(sorted_df))
+
+    return {
+        "sort_data": (lambda: raw_data, lambda raw: sort_data(raw)),
+        "sort_data_vectorized": (lambda: raw_data, lambda raw: sort_data(raw, vectorized=True)),
+        "setup_df": (lambda: flyer_path, setup_df),
+        "setup_df_vectorized": (lambda: flyer_path, lambda path: setup_df(path, vectorized=True)),
+        "clean_price_column": (lambda: _clean_input(sorted_df), clean_price_column),
+        "clean_deal_column": (price_df.copy, clean_deal_column),
+        "clean_data": (sorted_df.copy, clean_data),
+        "clean_data_typed": (sorted_df.copy, lambda df: clean_data(df, typed=True)),
+    }
+
+
+def _measure(setup, run, repeat: int) -> tuple[float, float, float]:
+    times = []
+    for _ in range(repeat):
+        arg = setup()
+        start = time.perf_counter()
+        run(arg)
+        times.append(time.perf_counter() - start)
+
+    median = statistics.median(times)
+    spread = statistics.median(abs(t - median) for t in times) / median
+
+    arg = setup()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        run(arg)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+    return median, spread, peak / 1e6
+
+
+def _status_mb(field: str) -> float:
+    # /proc/self/status reports VmRSS / VmHWM in kB
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) / 1024
+    raise KeyError(field)
+
+
+def _stage_rss_mb(name: str, rows: int, seed: int, flyer_path: str) -> float:
+    """Runs in a fresh interpreter: how far one run of the stage lifts RSS above where it started."""
+
+    setup, run = _stages(make_labels(rows, seed), flyer_path)[name]
+    arg = setup()
+    gc.collect()
+
+    # Building the inputs set a high-water mark of its own; reset it (Linux 4.0+)
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    before = _status_mb("VmRSS")
+    run(arg)
+    return _status_mb("VmHWM") - before
+
+
+def _measure_rss(name: str, rows: int, seed: int, flyer_path: str) -> float:
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(_stage_rss_mb, (name, rows, seed, flyer_path))
+
+
+def run_stages(rows: int, seed: int = 0, repeat: int = 7, stages: list[str] | None = None) -> dict:
+
+    raw_data = make_labels(rows, seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        flyer_path = write_flyer(str(Path(tmp) / "weeklyad_2025-01-01.csv"), rows, seed)
+
+        results = {}
+        for name, (setup, run) in _stages(raw_data, flyer_path).items():
+            if stages and name not in stages:
+                continue
+            seconds, spread, peak_mb = _measure(setup, run, repeat)
+            results[name] = {
+                "seconds": round(seconds, 4),
+                "rows_per_s": round(rows / seconds),
+                "spread": round(spread, 3),
+                "peak_mb": round(peak_mb, 2),
+            }
+            if name in ARROW_STAGES:
+                results[name]["rss_mb"] = round(_measure_rss(name, rows, seed, flyer_path), 2)
+
+    return results
+
+
+def compare(results: dict, baselines: dict, threshold: float) -> list[str]:
+
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+
+        allowed = max(
+            threshold, NOISE_FACTOR * max(result.get("spread", 0), baseline.get("spread", 0))
+        )
+        if result["rows_per_s"] < baseline["rows_per_s"] * (1 - allowed):
+            regressions.append(
+                f"{name}: {result['rows_per_s']:,} rows/s vs baseline {baseline['rows_per_s']:,} "
+                f"(allowed {allowed:.0%})"
+            )
+        for memory in ("peak_mb", "rss_mb"):
+            if memory not in result or memory not in baseline:
+                continue
+            if result[memory] > max(baseline[memory] * (1 + threshold), baseline[memory] + MEMORY_SLACK_MB):
+                regressions.append(
+                    f"{name}: {memory} {result[memory]} MB vs baseline {baseline[memory]} MB"
+                )
+
+    return regressions
+
+
+def _machine() -> dict:
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "processor": platform.machine(),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the parse and clean stages.")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--stage", action="append", dest="stages", help="run only these stages")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baselines")
+    parser.add_argument("--check", action="store_true", help="fail on regressions against the baselines")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--baselines", default=str(BASELINES_PATH))
+    args = parser.parse_args()
+
+    results = run_stages(args.rows, args.seed, args.repeat, args.stages)
+
+    print(f"{'stage':<22} {'seconds':>9} {'rows/s':>12} {'spread':>7} {'peak MB':>9} {'RSS MB':>8}")
+    for name, result in results.items():
+        rss = f"{result['rss_mb']:>8.2f}" if "rss_mb" in result else f"{'-':>8}"
+        print(
+            f"{name:<22} {result['seconds']:>9.4f} {result['rows_per_s']:>12,} "
+            f"{result['spread']:>7.1%} {result['peak_mb']:>9.2f} {rss}"
+        )
+
+    if args.save:
+        with open(args.baselines, "w", encoding="utf-8") as f:
+            json.dump(
+                {"rows": args.rows, "seed": args.seed, "machine": _machine(), "stages": results},
+                f,
+                indent=2,
+            )
+            f.write("\n")
+        print(f"Saved baselines to {args.baselines}")
+
+    if args.check:
+        with open(args.baselines, encoding="utf-8") as f:
+            stored = json.load(f)
+
+        if stored["rows"] != args.rows or stored["seed"] != args.seed:
+            print(f"Baselines were recorded with --rows {stored['rows']} --seed {stored['seed']}")
+            return 1
+        if stored["machine"] != _machine():
+            print(f"Warning: baselines were recorded on {stored['machine']}")
+
+        regressions = compare(results, stored["stages"], args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions past {args.threshold:.0%}.")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Seeded generator of synthetic Safeway weekly-ad aria-labels.
+
+Labels follow the shapes the scraper returns: "<product>, <deal>, <price>" with an
+empty deal for plain items. Together the templates cover every deal keyword of the
+Safeway grammar, every discard rule, every price form the cleaner handles, and
+labels the parser drops (no price, no separator). The same seed always gives the
+same labels, so benchmark runs are comparable.
+
+Functions:
+    make_labels(n: int, seed: int = 0) -> pd.Series: n labels, as read from a raw scrape.
+    write_flyer(path: str, n: int, seed: int = 0, valid_from: str = ..., valid_until: str = ...) -> str:
+        Writes a raw scrape CSV (date-range row, then the labels) and returns its path.
+
+Usage:
+    python -m grocery_god.benchmarks.synthetic data/weeklyad_2025-01-01.csv --rows 30000
+"""
+
+import argparse
+import random
+
+import pandas as pd
+
+from grocery_god.scraping.safeway import write_csv_rows
+
+BRANDS = [
+    "Lucerne",
+    "Signature Select",
+    "O Organics",
+    "Open Nature",
+    "Tillamook",
+    "Coca-Cola",
+    "Kraft",
+    "Tide",
+    "Dole",
+    "Waterfront Bistro",
+]
+
+ITEMS = [
+    "Large Eggs 12 ct",
+    "Whole Milk 1 gal",
+    "Ice Cream 48 oz",
+    "Cheddar Cheese 2 lb",
+    "Soda 12 pk 12 fl oz",
+    "Boneless Skinless Chicken Breast",
+    "Liquid Detergent 92 oz",
+    "Fuji Apples",
+    "Greek Yogurt 32 oz",
+    "Ground Beef 80% Lean",
+    "Shredded Mozzarella 8 oz",
+    "Sourdough Bread 24 oz",
+]
+
+# Every form clean_price_column handles
+PRICES = [
+    "$2.99 ea",
+    "$4.99 lb",
+    "$1.49/lb",
+    "member price $3.49",
+    "member price $3.49 ea",
+    "2 for $5",
+    "3/$10",
+    "4 for $5.00",
+    "$5.99 ea when you buy 2",
+    "$2.50 when you buy 4",
+    "starting at $1.99",
+    "$12.99 or more",
+    "$1,299.99",
+    "$0.99",
+    "free",
+    "",
+]
+
+# Every keyword of the Safeway grammar, every deal form the cleaner structures,
+# every discard rule, and labels the parser drops
+TEMPLATES = [
+    "{product}, , {price}",
+    "{product}, , {price}",
+    "{product}, , {price}",
+    "{product}, buy 2 get 1 free, {price}",
+    "{product}, buy 1 get 1 free equal or lesser value, {price}",
+    "{product}, buy 2 get 1 free member price, {price}",
+    "{product}, buy 2 when you buy 2, {price}",
+    "{product}, free item when you buy 2, {price}",
+    "{product}, free, {price}",
+    "{product}, earn 4x points, {price}",
+    "{product}, earn 2x points when you buy 3, {price}",
+    "{product}, up to 40% off, {price}",
+    "{product}, get 2 free when you buy 3, {price}",
+    "{product}, get 1 free, {price}",
+    "{product}, celebrate with savings, {price}",
+    "{product}, spend $50 get $10 off, {price}",
+    "{product}, spend $25.50, {price}",
+    "{product}, save $2.00, {price}",
+    "{product}, $1.50 off , {price}",
+    "{product}, $3 off , {price}",
+    "{product}, 25% off, {price}",
+    "{product}, , ",
+    "{product}, buy 2 get 1 free",
+    "{product}",
+]
+
+
+def make_labels(n: int, seed: int = 0) -> pd.Series:
+    rng = random.Random(seed)
+    labels = [
+        rng.choice(TEMPLATES).format(
+            product=f"{rng.choice(BRANDS)} {rng.choice(ITEMS)}", price=rng.choice(PRICES)
+        )
+        for _ in range(n)
+    ]
+    return pd.Series(labels, name="Raw Data")
+
+
+def write_flyer(
+    path: str,
+    n: int,
+    seed: int = 0,
+    valid_from: str = "2025-01-01",
+    valid_until: str = "2025-01-07",
+) -> str:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        write_csv_rows(f, make_labels(n, seed).tolist(), valid_from, valid_until)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic raw scrape CSV.")
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=30_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(write_flyer(args.path, args.rows, args.seed))
@@ -0,0 +1,221 @@
+"""
+Program Name: Grocery God Label Cache
+Description: Memoizes the parse + clean result of raw flyer labels, so labels that repeat week to week are only processed once.
+
+Modules:
+- hashlib: For the parser/cleaner version stamp.
+- json: For serializing cleaned records on disk.
+- os, sqlite3: For the on-disk cache layer.
+- collections.OrderedDict: For the in-process LRU layer.
+- pandas as pd: A powerful data analysis and manipulation library for Python.
+
+Classes:
+- LabelCache: Two-layer (in-process LRU + SQLite) cache mapping a normalized raw label to its
+    final cleaned record, or to None when the parser discards the label.
+
+Usage:
+- cache = LabelCache()
+- df = cache.clean_labels(raw_df["Raw Data"])
+- cache.stats() -> {"memory_hits": ..., "disk_hits": ..., "misses": ...}
+
+Note:
+- Entries are keyed by store and by a version stamp hashed from the parser, grammar and cleaner
+  sources plus the store's grammar, so any change to parsing or cleaning invalidates the cache.
+- The default on-disk location is ./data/cache, or /tmp/grocery_god when running in AWS Lambda.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from grocery_god.parsing import grammar as grammar_module
+from grocery_god.parsing import parser
+from grocery_god.cleaning import cleaner
+
+CACHE_SOURCES = [parser.__file__, grammar_module.__file__, cleaner.__file__]
+
+# Dtypes of clean_data's columns before it prepares them for JSON; the rest stay object
+# (ounces holds None or the int 16, so it must not become float)
+RECORD_DTYPES = {
+    "price": "float64",
+    "units": "int64",
+    "unit_price": "float64",
+    "buy_qty": "Int64",
+    "free_qty": "Int64",
+    "threshold": "float64",
+    "effective_unit_price": "float64",
+}
+
+
+def _default_cache_path() -> Path:
+    if os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+        return Path("/tmp/grocery_god") / "labels.sqlite"
+    return Path("./data/cache") / "labels.sqlite"
+
+
+def version_stamp(store: str = "safeway") -> str:
+    digest = hashlib.sha1()
+    for source in CACHE_SOURCES:
+        with open(source, "rb") as f:
+            digest.update(f.read())
+
+    grammar = grammar_module.get_grammar(store)
+    digest.update(grammar.keyword_pattern.encode())
+    digest.update(grammar.discard_pattern.encode())
+    return digest.hexdigest()
+
+
+def _to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return None
+
+
+class LabelCache:
+
+    def __init__(
+        self,
+        path: str | None = None,
+        store: str = "safeway",
+        max_memory_entries: int = 100_000,
+        max_disk_entries: int = 1_000_000,
+    ):
+        self.store = store
+        self.version = version_stamp(store)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+
+        self._memory: OrderedDict[str, dict | None] = OrderedDict()
+        self._hits = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        self.path = Path(path) if path else _default_cache_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS labels ("
+            "store TEXT, label TEXT, version TEXT, record TEXT, last_used REAL, "
+            "PRIMARY KEY (store, label))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS labels_last_used ON labels (last_used)")
+
+        # Drop entries written by another parser/cleaner version
+        self._db.execute(
+            "DELETE FROM labels WHERE store = ? AND version != ?", (store, self.version)
+        )
+        self._db.commit()
+
+    def get_many(self, labels: list[str]) -> dict[str, dict | None]:
+        found = {}
+        disk_lookups = []
+
+        for label in labels:
+            if label in self._memory:
+                self._memory.move_to_end(label)
+                found[label] = self._memory[label]
+                self._hits["memory_hits"] += 1
+            else:
+                disk_lookups.append(label)
+
+        # SQLite caps the number of bound parameters per statement
+        for i in range(0, len(disk_lookups), 500):
+            batch = disk_lookups[i : i + 500]
+            rows = self._db.execute(
+                f"SELECT label, record FROM labels WHERE store = ? AND version = ? "
+                f"AND label IN ({', '.join('?' * len(batch))})",
+                [self.store, self.version, *batch],
+            ).fetchall()
+
+            now = time.time()
+            self._db.executemany(
+                "UPDATE labels SET last_used = ? WHERE store = ? AND label = ?",
+                [(now, self.store, label) for label, _ in rows],
+            )
+            for label, record in rows:
+                found[label] = json.loads(record)
+                self._remember(label, found[label])
+            self._hits["disk_hits"] += len(rows)
+
+        self._hits["misses"] += len(labels) - len(found)
+        self._db.commit()
+        return found
+
+    def put_many(self, records: dict[str, dict | None]) -> None:
+        now = time.time()
+        self._db.executemany(
+            "INSERT OR REPLACE INTO labels (store, label, version, record, last_used) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (self.store, label, self.version, json.dumps(record, default=_to_json), now)
+                for label, record in records.items()
+            ],
+        )
+        for label, record in records.items():
+            self._remember(label, record)
+
+        # Size-bounded eviction of the least recently used entries
+        (count,) = self._db.execute("SELECT COUNT(*) FROM labels").fetchone()
+        if count > self.max_disk_entries:
+            self._db.execute(
+                "DELETE FROM labels WHERE rowid IN "
+                "(SELECT rowid FROM labels ORDER BY last_used LIMIT ?)",
+                (count - self.max_disk_entries,),
+            )
+        self._db.commit()
+
+    def clean_labels(self, raw_data: pd.Series) -> pd.DataFrame:
+        labels = [str(row).lower() for row in raw_data]
+        records = self.get_many(list(dict.fromkeys(labels)))
+
+        misses = [label for label in dict.fromkeys(labels) if label not in records]
+        if misses:
+            records.update(self._parse_and_clean(misses))
+
+        # Same columns, dtypes and None handling as clean_data, so hits write the same CSV
+        df = pd.DataFrame(
+            [records[label] for label in labels if records[label]],
+            columns=list(cleaner.CLEAN_DTYPES),
+            dtype=object,
+        ).astype(RECORD_DTYPES)
+        df.replace({pd.NA: None, np.nan: None}, inplace=True)
+
+        return df
+
+    def _parse_and_clean(self, labels: list[str]) -> dict[str, dict | None]:
+        grammar = grammar_module.get_grammar(self.store)
+
+        sorted_rows = {label: parser.sort_row(label, grammar) for label in labels}
+        kept = [label for label in labels if sorted_rows[label]]
+
+        df = pd.DataFrame(
+            [sorted_rows[label] for label in kept], columns=["product", "deal", "price"]
+        )
+        clean_records = cleaner.clean_data(df).to_dict(orient="records") if kept else []
+
+        # Round-trip through JSON so memory hits look exactly like disk hits
+        records = {label: None for label in labels}
+        for label, record in zip(kept, clean_records):
+            records[label] = json.loads(json.dumps(record, default=_to_json))
+
+        self.put_many(records)
+        return records
+
+    def _remember(self, label: str, record: dict | None) -> None:
+        self._memory[label] = record
+        self._memory.move_to_end(label)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = sum(self._hits.values())
+        hits = self._hits["memory_hits"] + self._hits["disk_hits"]
+        return {**self._hits, "hit_rate": round(hits / lookups, 4) if lookups else 0.0}
+
+    def close(self) -> None:
+        self._db.close()
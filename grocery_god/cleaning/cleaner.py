@@ -10,13 +10,18 @@ Modules:
 - pandas as pd: A powerful data analysis and manipulation library for Python.
 - numpy as np: A fundamental package for scientific computing with Python.
 - re: Provides regular expression matching operations.
+- pyarrow as pa: Arrow-backed string dtype for the typed output mode.
+- grocery_god.metrics: Stage timing and row counts.
 
 Functions:
 - clean_price_column(df: pd.DataFrame) -> pd.DataFrame: Cleans the 'price' column in the DataFrame.
-- extract_price_constraints(row: pd.Series) -> tuple[float, float, int]: Extracts price constraints from a row.
+- extract_price_columns(price: pd.Series) -> tuple[pd.Series, pd.Series, pd.Series]: Extracts price constraints from a whole price column at once.
 - clean_deal_column(df: pd.DataFrame) -> pd.DataFrame: Cleans the 'deal' column in the DataFrame.
-- extract_deal_constraints(row: pd.Series) -> tuple[str, int, float]: Extracts deal constraints from a row.
-- clean_data(df: pd.DataFrame) -> pd.DataFrame: Cleans the entire DataFrame by applying the cleaning functions.
+- extract_deal_columns(deal, price, units, unit_price) -> pd.DataFrame: Parses every deal form in bulk into deal, units, unit_price and the structured deal_type, buy_qty, free_qty, threshold and effective_unit_price columns.
+- to_typed(df: pd.DataFrame) -> pd.DataFrame: Casts cleaned columns to the compact dtypes in CLEAN_DTYPES.
+- clean_data(df: pd.DataFrame, typed: bool = False) -> pd.DataFrame: Cleans the entire DataFrame by applying the cleaning functions.
+    With typed=True the result keeps compact numeric, categorical and Arrow string dtypes instead of
+    JSON-ready object columns; conversion to JSON then happens at upload (see db.database.upload_clean_data).
 
 Usage:
 - Import the script and call the `clean_data` function with a pandas DataFrame containing grocery data.
@@ -29,29 +34,55 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import pandas as pd
 import numpy as np
+import pyarrow as pa
 import re
 
+from grocery_god.metrics import span
+
+
+# Every unwanted word/symbol of the price column in one pass
+PRICE_STRIP_RX = re.compile(r"member price|or more|starting at|ea|[$,]")
+WHEN_YOU_BUY_RX = re.compile(r"when\s*you\s*buy\s*(?P<units>\d+)")
+MULTI_PRICE_RX = re.compile(r"(?P<count>\d+)\s*(?:for|/)\s*(?P<total>\d+\.\d+|\d+)")
+
 
 def clean_price_column(df: pd.DataFrame) -> pd.DataFrame:
 
     # "" -> None prices
-    df["price"] = df["price"].apply(lambda x: None if x == "" else x)
+    df["price"] = df["price"].replace("", None)
 
     # Remove unwanted words/symbols
-    remove_list = ["member price", "$", ",", "or more", "starting at", "ea", "ea."]
-    for item in remove_list:
-        df["price"] = df["price"].str.replace(item, "", regex=False).str.strip()
+    df["price"] = df["price"].str.replace(PRICE_STRIP_RX, "", regex=True).str.strip()
 
-    df.loc[df["price"].str.contains("lb", na=False), "ounces"] = 16
+    df.loc[df["price"].str.contains("lb", na=False, regex=False), "ounces"] = 16
     df["price"] = df["price"].str.replace("lb", "", regex=False).str.strip()
 
-    df["price"], df["unit_price"], df["units"] = zip(
-        *df.apply(extract_price_constraints, axis=1)
-    )
+    df["price"], df["unit_price"], df["units"] = extract_price_columns(df["price"])
 
     return df
 
 
+def extract_price_columns(price: pd.Series) -> tuple[pd.Series, pd.Series, pd.Series]:
+
+    # get units
+    units = price.str.extract(WHEN_YOU_BUY_RX)["units"].astype(float).fillna(1)
+    price = price.str.replace(WHEN_YOU_BUY_RX, "", regex=True).str.strip()
+
+    # "N for $X" / "N/$X" prices
+    multi = price.str.extract(MULTI_PRICE_RX).astype(float)
+    is_multi = multi["total"].notna()
+
+    # Plain prices
+    single = pd.to_numeric(price.where(~is_multi), errors="coerce")
+    failed = ~is_multi & single.isna()
+
+    unit_price = single.mask(is_multi, (multi["total"] / multi["count"]).round(2))
+    price = (single * units).mask(is_multi, multi["total"])
+    units = units.mask(failed, 1).astype(int)
+
+    return price, unit_price, units
+
+
 # def parseValues(values: list[list[str]], parsers: List[Callable[Any, Any]]):
 #   output = []
 #   for val in values:
@@ -63,77 +94,110 @@ def clean_price_column(df: pd.DataFrame) -> pd.DataFrame:
 #   return output
 
 
-def extract_price_constraints(row: pd.Series) -> tuple[float, float, int]:
-
-    price = row["price"]
-    units = 1
-    unit_price = None
-
-    if price is None:
-        return price, unit_price, units
+# Deal grammar emitted by the parser, one pattern per structured column
+DEAL_STRIP_RX = re.compile(r"member price|equal or lesser value")
+DEAL_TYPE_RX = re.compile(r"^(?P<deal_type>buy|free|earn|up|get|celebrate with|spend)\b")
+BUY_GET_FREE_RX = re.compile(r"buy\s*(?P<buy>\d+)\s*get\s*(?P<free>\d+)\s*free")
+BUY_QTY_RX = re.compile(r"buy\s*(?P<buy_qty>\d+)")
+FREE_QTY_RX = re.compile(r"get\s*(?P<free_qty>\d+)\s*free")
+FREE_ITEM_RX = re.compile(r"^free\s*item\b")
+THRESHOLD_RX = re.compile(r"spend\s*\$\s*(?P<threshold>\d+\.\d+|\d+)")
 
-    match = re.search(r"when\s*you\s*buy\s*(\d+)", price)
-    if match:
-        units = int(match.group(1))
-        price = price.replace(match.group(0), "").strip()
-
-    match = re.search(r"(\d+)\s*(for|/)\s*(\d+\.\d+|\d+)", price)
-    if match:
-        total_price = float(match.group(3))
-        count = float(match.group(1))
-        unit_price = round(total_price / count, 2)
-        price = total_price
-    else:
-        try:
-            unit_price = float(price)
-            price = unit_price * units
-        except ValueError:
-            return None, None, 1
-
-    return price, unit_price, units
+DEAL_TYPES = {
+    "buy": "buy",
+    "free": "free",
+    "earn": "earn",
+    "up": "up_to",
+    "get": "get",
+    "celebrate with": "celebrate",
+    "spend": "spend",
+}
 
 
 def clean_deal_column(df: pd.DataFrame) -> pd.DataFrame:
 
     # Remove unwanted phrases
-    remove_list = ["member price", "equal or lesser value"]
-    for item in remove_list:
-        df["deal"] = df["deal"].str.replace(item, "", regex=False).str.strip()
+    df["deal"] = df["deal"].str.replace(DEAL_STRIP_RX, "", regex=True).str.strip()
 
-    df["deal"], df["units"], df["unit_price"] = zip(
-        *df.apply(extract_deal_constraints, axis=1)
+    deal_columns = extract_deal_columns(
+        df["deal"], df["price"], df["units"], df["unit_price"]
     )
+    for column in deal_columns:
+        df[column] = deal_columns[column]
 
     return df
 
 
-def extract_deal_constraints(row: pd.Series) -> tuple[str, int, float]:
-
-    deal, units, price, unit_price = (
-        row["deal"],
-        row["units"],
-        row["price"],
-        row["unit_price"],
-    )
-    if not deal:
-        return deal, units, unit_price
+def extract_deal_columns(
+    deal: pd.Series, price: pd.Series, units: pd.Series, unit_price: pd.Series
+) -> pd.DataFrame:
 
     # get units
-    match = re.search(r"when\s*you\s*buy\s*(\d+)", deal)
-    if match:
-        units = int(match.group(1))
-        deal = deal.replace(match.group(0), "").strip()
+    deal_units = deal.str.extract(WHEN_YOU_BUY_RX)["units"].astype(float)
+    units = deal_units.fillna(units).astype(int)
+    deal = deal.str.replace(WHEN_YOU_BUY_RX, "", regex=True).str.strip()
 
     # get unit_price
-    match = re.search(r"buy\s*(\d+)\s*get\s*(\d+)\s*free", deal)
-    if match and price:
-        cost = int(match.group(1)) * float(price)
-        unit_price = round(cost / units, 2)
+    buy_get_free = deal.str.extract(BUY_GET_FREE_RX).astype(float)
+    is_buy_get_free = buy_get_free["buy"].notna()
+    deal_unit_price = unit_price.mask(
+        is_buy_get_free & (price != 0),
+        (buy_get_free["buy"] * price / units).round(2),
+    )
 
-    return deal, units, unit_price
+    # Structured deal semantics
+    deal_type = deal.str.extract(DEAL_TYPE_RX)["deal_type"].map(DEAL_TYPES)
+    deal_type = deal_type.mask(is_buy_get_free, "buy_get_free")
+    # "get 2 free when you buy 3" / "free item when you buy 2": the when-you-buy count is the
+    # number paid for, and "free item" is one free item
+    buy_qty = deal.str.extract(BUY_QTY_RX)["buy_qty"].astype(float).fillna(deal_units)
+    free_qty = deal.str.extract(FREE_QTY_RX)["free_qty"].astype(float)
+    free_qty = free_qty.mask(free_qty.isna() & deal.str.contains(FREE_ITEM_RX, na=False), 1.0)
+    threshold = deal.str.extract(THRESHOLD_RX)["threshold"].astype(float)
+
+    # Price per item actually taken home: pay for buy_qty, receive buy_qty + free_qty
+    has_free_items = buy_qty.notna() & free_qty.notna()
+    effective_unit_price = deal_unit_price.mask(
+        has_free_items, (unit_price * buy_qty / (buy_qty + free_qty)).round(2)
+    )
 
+    return pd.DataFrame(
+        {
+            "deal": deal,
+            "units": units,
+            "unit_price": deal_unit_price,
+            "deal_type": deal_type,
+            "buy_qty": buy_qty.astype("Int64"),
+            "free_qty": free_qty.astype("Int64"),
+            "threshold": threshold,
+            "effective_unit_price": effective_unit_price,
+        }
+    )
 
-def clean_data(df: pd.DataFrame) -> pd.DataFrame:
+
+# Compact dtypes of the typed output mode; see to_typed
+CLEAN_DTYPES = {
+    "product": pd.ArrowDtype(pa.string()),
+    "deal": "category",
+    "price": "float64",
+    "units": "int16",
+    "unit_price": "float64",
+    "ounces": "float64",
+    "deal_type": "category",
+    "buy_qty": "Int16",
+    "free_qty": "Int16",
+    "threshold": "float64",
+    "effective_unit_price": "float64",
+}
+
+
+def to_typed(df: pd.DataFrame) -> pd.DataFrame:
+
+    # Missing values become NaN / <NA> instead of None, so no column stays object
+    return df.astype({column: dtype for column, dtype in CLEAN_DTYPES.items() if column in df})
+
+
+def clean_data(df: pd.DataFrame, typed: bool = False) -> pd.DataFrame:
 
     # Initialize columns
     df["units"] = 1
@@ -141,8 +205,12 @@ def clean_data(df: pd.DataFrame) -> pd.DataFrame:
     df["ounces"] = None
 
     # Apply cleaning functions
-    df = clean_price_column(df)
-    df = clean_deal_column(df)
+    with span("clean_data", rows=len(df)):
+        df = clean_price_column(df)
+        df = clean_deal_column(df)
+
+    if typed:
+        return to_typed(df)
 
     # Prepare for JSON formatting
     df.replace({pd.NA: None, np.nan: None}, inplace=True)
@@ -0,0 +1,160 @@
+"""
+Program Name: Grocery God Product Matching
+Description: Matches logged trip products to flyer products through a token and character n-gram inverted index.
+
+Modules:
+- math: For IDF weights and vector norms.
+- collections: For postings lists and candidate counts.
+- pandas as pd: A powerful data analysis and manipulation library for Python.
+- grocery_god.db.history: For product normalization and the flyer and trip history.
+
+Functions:
+- product_terms(name: str, ngram: int = 3) -> set[str]: Word and character n-gram terms of a product name.
+
+Classes:
+- ProductIndex: Inverted index over distinct normalized flyer product names. It is updated
+    incrementally and answers scored top-k matches for free-text names.
+
+Usage:
+- index = ProductIndex()
+- index.sync(history)                                  # only flyer rows added since the last sync
+- index.match("large eggs", brand="lucerne")           # [("lucerne large eggs 12 ct", 0.71), ...]
+- index.match_trip_products(history, trip_id=12)       # one row per trip product and candidate
+
+Note:
+- Scores are IDF-weighted cosine similarities of the term sets, in [0, 1]. Word terms reward exact
+  words; character n-grams tolerate typos, plurals and abbreviations ("chkn", "apple" / "apples").
+- Candidates come from the postings of the query's rarer terms only (document frequency up to
+  max_df), so a query touches a few short postings lists instead of every product in the history.
+"""
+
+import math
+from collections import Counter, defaultdict
+from typing import Iterable
+
+import pandas as pd
+
+from grocery_god.db.history import PriceHistory, normalize_product
+
+
+def product_terms(name: str, ngram: int = 3) -> set[str]:
+
+    terms = set()
+    for token in normalize_product(name).split():
+        terms.add(f"w:{token}")
+
+        # Padded, so n-grams also mark where a word starts and ends
+        padded = f" {token} "
+        terms.update(padded[i:i + ngram] for i in range(len(padded) - ngram + 1))
+
+    return terms
+
+
+class ProductIndex:
+
+    def __init__(self, ngram: int = 3, max_df: float = 0.05, max_candidates: int = 200):
+        self.ngram = ngram
+        self.max_df = max_df
+        self.max_candidates = max_candidates
+
+        self.products = []
+        self._doc_ids = {}
+        self._doc_terms = []
+        self._postings = defaultdict(list)
+        self._last_rowid = 0
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def add(self, products: Iterable[str]) -> int:
+        """Indexes product names not seen before; returns how many were added."""
+
+        added = 0
+        for product in products:
+            normalized = normalize_product(product)
+            if not normalized or normalized in self._doc_ids:
+                continue
+
+            doc_id = len(self.products)
+            terms = product_terms(normalized, self.ngram)
+
+            self.products.append(normalized)
+            self._doc_ids[normalized] = doc_id
+            self._doc_terms.append(terms)
+            for term in terms:
+                self._postings[term].append(doc_id)
+            added += 1
+
+        return added
+
+    def sync(self, history: PriceHistory) -> int:
+        """Indexes the flyer products added to `history` since the last sync; returns how many were new."""
+
+        rows = history.new_flyer_products(self._last_rowid)
+        if not rows:
+            return 0
+
+        self._last_rowid = rows[-1][0]
+        return self.add(product for _, product in rows)
+
+    def _idf(self, term: str) -> float:
+        return math.log((len(self.products) + 1) / (len(self._postings.get(term, ())) + 1)) + 1
+
+    def _norm(self, terms: set[str]) -> float:
+        return math.sqrt(sum(self._idf(term) ** 2 for term in terms))
+
+    def match(
+        self, name: str, brand: str | None = None, top_k: int = 5, min_score: float = 0.3
+    ) -> list[tuple[str, float]]:
+        """Best flyer products for a free-text name, as (product, score) pairs, best first."""
+
+        # Logged brands are a separate field; flyer labels usually start with the brand
+        if brand and normalize_product(brand) not in normalize_product(name):
+            name = f"{brand} {name}"
+
+        query = product_terms(name, self.ngram)
+        known = [term for term in query if term in self._postings]
+        if not known:
+            return []
+
+        # Rare terms pick the candidates; fall back to the rarest few when every term is common
+        by_rarity = sorted(known, key=lambda term: len(self._postings[term]))
+        limit = max(1, int(self.max_df * len(self.products)))
+        selective = [term for term in by_rarity if len(self._postings[term]) <= limit] or by_rarity[:3]
+
+        overlap = Counter()
+        for term in selective:
+            overlap.update(self._postings[term])
+
+        # Terms no flyer product has still count against the query, at the highest IDF
+        query_norm = self._norm(query)
+        scored = []
+        for doc_id, _ in overlap.most_common(self.max_candidates):
+            terms = self._doc_terms[doc_id]
+            shared = sum(self._idf(term) ** 2 for term in query & terms)
+            score = shared / (query_norm * self._norm(terms))
+            if score >= min_score:
+                scored.append((self.products[doc_id], round(score, 4)))
+
+        scored.sort(key=lambda pair: pair[1], reverse=True)
+        return scored[:top_k]
+
+    def match_trip_products(
+        self, history: PriceHistory, trip_id: int | None = None, top_k: int = 3, min_score: float = 0.3
+    ) -> pd.DataFrame:
+        """Candidate flyer products for each logged trip product (all trips when trip_id is None)."""
+
+        self.sync(history)
+
+        rows = [
+            {
+                "trip_id": row["trip_id"],
+                "product": row["product"],
+                "brand": row["brand"],
+                "flyer_product": candidate,
+                "score": score,
+            }
+            for row in history.trip_products(trip_id)
+            for candidate, score in self.match(row["product"], row["brand"], top_k, min_score)
+        ]
+        return pd.DataFrame(rows, columns=["trip_id", "product", "brand", "flyer_product", "score"])
@@ -0,0 +1,244 @@
+"""
+Program Name: Grocery God Columnar Store
+Description: Writes raw scrapes and cleaned flyers as Parquet datasets, and reads many weeks of them back with column projection and predicate pushdown.
+
+Modules:
+- datetime.date: For the date partition values.
+- pathlib.Path: For dataset locations.
+- pandas as pd: A powerful data analysis and manipulation library for Python.
+- pyarrow, pyarrow.dataset: For the Arrow schemas and the partitioned Parquet datasets.
+
+Functions:
+- write_raw_parquet(all_products, valid_from, valid_until, root=RAW_ROOT, store="safeway") -> str:
+    Writes one raw scrape (the label list) to the raw dataset.
+- write_clean_parquet(df, valid_from, valid_until, root=CLEAN_ROOT, store="safeway") -> str:
+    Writes one cleaned flyer (the output of `clean_data`) to the clean dataset.
+- export_scrape(all_products, valid_from, valid_until, raw_root=RAW_ROOT, clean_root=CLEAN_ROOT, store="safeway", grammar=None) -> tuple[str, str]:
+    Writes a scrape to the raw dataset, and its parsed and cleaned rows to the clean dataset.
+    `store` is the partition the scrape is written to; `grammar` names the parser grammar when it
+    differs from `store` (e.g. store="store-1234", grammar="safeway").
+- read_raw(root=RAW_ROOT, columns=None, store=None, since=None, until=None, filter=None) -> pd.DataFrame:
+    Reads raw labels for a range of weeks.
+- read_clean(root=CLEAN_ROOT, columns=None, store=None, since=None, until=None, filter=None) -> pd.DataFrame:
+    Reads cleaned flyer rows for a range of weeks.
+- convert_raw_csv(file_path, raw_root=RAW_ROOT, clean_root=CLEAN_ROOT, store="safeway") -> tuple[str, str]:
+    Converts one raw scrape CSV into both datasets.
+
+Usage:
+- Both datasets are hive-partitioned as <root>/store=<store>/valid_from=<YYYY-MM-DD>/part-0.parquet.
+  Rewriting a week replaces its partition, so exports are idempotent; scrapes of different
+  stores for the same week need different `store` values, or the last one replaces the others.
+- read_clean(columns=["product", "price"], store="safeway", since="2025-01-01") only opens the
+  matching partitions and only decodes the requested columns. `filter` takes any further
+  pyarrow.dataset expression, e.g. ds.field("price") < 2, and is pushed down to the row groups.
+- python -m grocery_god.db.columnar data/weeklyad_*.csv converts historical CSV scrapes.
+- The Safeway pipeline calls export_scrape after each scrape when EXPORT_PARQUET=1, under
+  <output_path>/parquet/{raw,clean} and with the fan-out target's name as the store
+  (see pipelines.safeway).
+"""
+
+import argparse
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+RAW_ROOT = "./data/parquet/raw"
+CLEAN_ROOT = "./data/parquet/clean"
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("store", pa.string()), ("valid_from", pa.date32())]), flavor="hive"
+)
+
+# One row per scraped label, in page order
+RAW_SCHEMA = pa.schema(
+    [
+        ("position", pa.int32()),
+        ("label", pa.string()),
+        ("valid_until", pa.date32()),
+    ]
+)
+
+# One row per product of `clean_data`, matching its typed mode (cleaner.CLEAN_DTYPES)
+CLEAN_SCHEMA = pa.schema(
+    [
+        ("product", pa.string()),
+        ("deal", pa.string()),
+        ("price", pa.float64()),
+        ("units", pa.int16()),
+        ("unit_price", pa.float64()),
+        ("ounces", pa.float64()),
+        ("deal_type", pa.string()),
+        ("buy_qty", pa.int16()),
+        ("free_qty", pa.int16()),
+        ("threshold", pa.float64()),
+        ("effective_unit_price", pa.float64()),
+        ("valid_until", pa.date32()),
+    ]
+)
+
+# Read nullable integers back as pandas nullable integers instead of floats
+_TYPES_MAPPER = {
+    pa.int16(): pd.Int16Dtype(),
+    pa.int32(): pd.Int32Dtype(),
+    pa.int64(): pd.Int64Dtype(),
+}.get
+
+
+def _write_partition(table: pa.Table, root: str, store: str, valid_from: str) -> str:
+
+    table = table.append_column(
+        "store", pa.array([store] * table.num_rows, pa.string())
+    ).append_column(
+        "valid_from", pa.array([date.fromisoformat(valid_from)] * table.num_rows, pa.date32())
+    )
+
+    ds.write_dataset(
+        table,
+        root,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template="part-{i}.parquet",
+        existing_data_behavior="delete_matching",
+    )
+
+    return str(Path(root) / f"store={store}" / f"valid_from={valid_from}")
+
+
+def write_raw_parquet(
+    all_products: list[str],
+    valid_from: str,
+    valid_until: str,
+    root: str = RAW_ROOT,
+    store: str = "safeway",
+) -> str:
+
+    table = pa.table(
+        {
+            "position": pa.array(range(len(all_products)), pa.int32()),
+            "label": pa.array(all_products, pa.string()),
+            "valid_until": pa.array([date.fromisoformat(valid_until)] * len(all_products), pa.date32()),
+        },
+        schema=RAW_SCHEMA,
+    )
+
+    return _write_partition(table, root, store, valid_from)
+
+
+def write_clean_parquet(
+    df: pd.DataFrame,
+    valid_from: str,
+    valid_until: str,
+    root: str = CLEAN_ROOT,
+    store: str = "safeway",
+) -> str:
+
+    df = df.assign(valid_until=date.fromisoformat(valid_until))
+    table = pa.Table.from_pandas(df[CLEAN_SCHEMA.names], schema=CLEAN_SCHEMA, preserve_index=False)
+
+    return _write_partition(table, root, store, valid_from)
+
+
+def _read(
+    root: str,
+    columns: list[str] | None,
+    store: str | None,
+    since: str | None,
+    until: str | None,
+    filter: ds.Expression | None,
+) -> pd.DataFrame:
+
+    dataset = ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+
+    # Conditions on the partition fields prune whole directories before any file is opened
+    conditions = [] if filter is None else [filter]
+    if store is not None:
+        conditions.append(ds.field("store") == store)
+    if since is not None:
+        conditions.append(ds.field("valid_from") >= date.fromisoformat(since))
+    if until is not None:
+        conditions.append(ds.field("valid_from") <= date.fromisoformat(until))
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    table = dataset.to_table(columns=columns, filter=expression)
+    return table.to_pandas(types_mapper=_TYPES_MAPPER)
+
+
+def read_raw(
+    root: str = RAW_ROOT,
+    columns: list[str] | None = None,
+    store: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    filter: ds.Expression | None = None,
+) -> pd.DataFrame:
+
+    return _read(root, columns, store, since, until, filter)
+
+
+def read_clean(
+    root: str = CLEAN_ROOT,
+    columns: list[str] | None = None,
+    store: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    filter: ds.Expression | None = None,
+) -> pd.DataFrame:
+
+    return _read(root, columns, store, since, until, filter)
+
+
+def export_scrape(
+    all_products: list[str],
+    valid_from: str,
+    valid_until: str,
+    raw_root: str = RAW_ROOT,
+    clean_root: str = CLEAN_ROOT,
+    store: str = "safeway",
+    grammar: str | None = None,
+) -> tuple[str, str]:
+
+    # Deferred: the parsing stack reads datasets through this module
+    from grocery_god.parsing.parser import sort_data
+    from grocery_god.cleaning.cleaner import clean_data
+
+    raw_path = write_raw_parquet(all_products, valid_from, valid_until, root=raw_root, store=store)
+
+    products, deals, prices = sort_data(
+        pd.Series(all_products, name="Raw Data", dtype=object), store=grammar or store
+    )
+    clean_df = clean_data(pd.DataFrame({"product": products, "deal": deals, "price": prices}), typed=True)
+    clean_path = write_clean_parquet(clean_df, valid_from, valid_until, root=clean_root, store=store)
+
+    return raw_path, clean_path
+
+
+def convert_raw_csv(
+    file_path: str,
+    raw_root: str = RAW_ROOT,
+    clean_root: str = CLEAN_ROOT,
+    store: str = "safeway",
+) -> tuple[str, str]:
+
+    # The first row of a raw scrape is its date range
+    labels = pd.read_csv(file_path, names=["Raw Data"])["Raw Data"].tolist()
+    valid_from, valid_until = (part.strip() for part in labels[0].split(" - "))
+
+    return export_scrape(labels[1:], valid_from, valid_until, raw_root, clean_root, store)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert raw scrape CSVs to Parquet datasets.")
+    parser.add_argument("file_paths", nargs="+")
+    parser.add_argument("--raw-root", default=RAW_ROOT)
+    parser.add_argument("--clean-root", default=CLEAN_ROOT)
+    parser.add_argument("--store", default="safeway")
+    args = parser.parse_args()
+
+    for file_path in args.file_paths:
+        print(*convert_raw_csv(file_path, args.raw_root, args.clean_root, args.store))
@@ -10,36 +10,121 @@ Modules:
 - supabase: For interacting with the Supabase database.
 - dotenv: For loading environment variables from a .env file.
 - logging: For logging error messages and information.
+- concurrent.futures: For uploading product chunks in parallel.
+- grocery_god.metrics: For timing the product upload (imported on first upload).
+- threading: For building the shared Supabase client once per process.
+- httpx: For the pooled keep-alive HTTP sessions behind the client.
 
 Functions:
+- get_client: Returns the process-wide Supabase client, creating it on first use.
 - fetch_trip_data: Fetches the latest trip data from the database.
 - fetch_trip_products: Fetches products for a given trip from the database.
 - insert_trip_data: Inserts trip and product data into the database.
 - upload_scrape: Uploads a scrape file to Supabase Storage.
-- upload_clean_data: Uploads cleaned data to the database, including flyer and product information.
+- upload_clean_data: Upserts cleaned data to the database, including flyer and product information, in parallel retried chunks.
 
 Usage:
-1. The script initializes a Supabase client using environment variables for the URL and key.
+1. get_client creates one Supabase client per process on first use, from the SUPABASE_URL and SUPABASE_KEY
+   environment variables, and every function below reuses its pooled keep-alive connections. Importing
+   this module does not read credentials or open connections.
 2. The fetch_trip_data function retrieves the most recent trip data from the "trips" table.
 3. The fetch_trip_products function retrieves products associated with a specific trip from the "trip_products" table.
 4. The insert_trip_data function inserts new trip data and associated products into the database.
 5. The upload_scrape function uploads a specified file to a designated bucket and folder in Supabase Storage.
-6. The upload_clean_data function inserts cleaned flyer and product data into the "flyers" and "flyer_products" tables, respectively.
+6. The upload_clean_data function upserts cleaned flyer and product data into the "flyers" and "flyer_products" tables, respectively.
 
 """
 
 import os
 import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import httpx
 import pandas as pd
-from supabase import create_client
 from dotenv import load_dotenv
 
-load_dotenv(override=True)
+# Connection pool shared by all PostgREST and storage requests of the process.
+# Keep-alive outlives the gaps between Streamlit reruns and between upload chunks.
+POOL_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=120)
+
+_client = None
+_client_lock = threading.Lock()
+
+# Columns of the "flyer_products" table; clean_data may carry extra analysis columns
+FLYER_PRODUCT_COLUMNS = ["product", "deal", "price", "units", "unit_price", "ounces"]
+
+# Natural keys used for idempotent upserts
+FLYER_KEY = ["store", "valid_from", "valid_until"]
+FLYER_PRODUCT_KEY = ["flyer_id", "product", "deal", "price"]
+
+""" Supabase Client """
+
+def _pooled_session(session: httpx.Client) -> httpx.Client:
+  """
+  Rebuilds a supabase-py HTTP session with the shared pool limits, keeping its URL, headers and timeout.
+  """
+  pooled = type(session)(
+    base_url=session.base_url,
+    headers=session.headers,
+    timeout=session.timeout,
+    follow_redirects=session.follow_redirects,
+    limits=POOL_LIMITS,
+    http2=True,
+  )
+  session.close()
+  return pooled
+
+def _create_client():
+  """
+  Creates the Supabase client and warms its PostgREST and storage sessions.
+  Raises:
+    RuntimeError: If SUPABASE_URL or SUPABASE_KEY is not set.
+  """
+  # Deferred: supabase pulls in auth, realtime and storage clients
+  from supabase import create_client
+
+  load_dotenv(override=True)
+  url = os.getenv("SUPABASE_URL")
+  key = os.getenv("SUPABASE_KEY")
+  if not url or not key:
+    raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set to use the database.")
+
+  client = create_client(url, key)
+
+  # supabase-py builds these sub-clients lazily and then caches them, so their sessions live as long as the client
+  postgrest = client.postgrest
+  postgrest.session = _pooled_session(postgrest.session)
+  storage = client.storage
+  storage.session = storage._client = _pooled_session(storage.session)
+
+  return client
+
+def get_client():
+  """
+  Returns the process-wide Supabase client, creating it on first use.
+  The client is safe to share between threads; its HTTP sessions pool and keep alive
+  connections, so repeated calls do not reconnect.
+  Returns:
+    supabase.Client: The shared client.
+  Raises:
+    RuntimeError: If SUPABASE_URL or SUPABASE_KEY is not set.
+  """
+  global _client
+
+  if _client is None:
+    with _client_lock:
+      if _client is None:
+        _client = _create_client()
+  return _client
+
+def __getattr__(name: str):
+  # Backwards compatibility for `from db.database import supabase`
+  if name == "supabase":
+    return get_client()
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Initialize Supabase Client
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 """ Logger DB Functions """
 
@@ -50,7 +135,7 @@ def fetch_trip_data() -> dict:
   Returns:
     dict: A dictionary containing the most recent trip data if available, otherwise None.
   """
-  response = supabase.table("trips").select("*").order("trip_id", desc=True).limit(1).execute()
+  response = get_client().table("trips").select("*").order("trip_id", desc=True).limit(1).execute()
   return response.data[0] if response.data else None
 
 # Fetch products for a given trip.
@@ -63,7 +148,7 @@ def fetch_trip_products(trip_id: int) -> list:
     list: A list of products associated with the specified trip. Returns an empty list if no products are found.
   """
   
-  response = supabase.table("trip_products").select("*").eq("trip_id", trip_id).execute()
+  response = get_client().table("trip_products").select("*").eq("trip_id", trip_id).execute()
   return response.data if response.data else []
 
 # Insert trip and product data
@@ -79,6 +164,7 @@ def insert_trip_data(store: str, trip_date: str, products: list) -> int:
   """
   
   
+  supabase = get_client()
   trip_data = {"store": store, "trip_date": trip_date}
   trip_response = supabase.table("trips").insert(trip_data).execute()
   
@@ -120,6 +206,7 @@ def upload_scrape(file_path: str, bucket_name: str = "scrapes", folder_name: str
 
   destination_path = f"{folder_name}/{os.path.basename(file_path)}"
 
+  supabase = get_client()
   try:
     response = supabase.storage.from_(bucket_name).upload(
       destination_path,
@@ -137,43 +224,144 @@ def upload_scrape(file_path: str, bucket_name: str = "scrapes", folder_name: str
     supabase.storage.from_(bucket_name).remove([destination_path])
     raise RuntimeError(f"Error uploading file to Supabase: {e}")
 
+def _with_retries(operation, description: str, retries: int = 3, backoff: float = 1.0):
+  """
+  Runs a database operation, retrying failures with exponential backoff and jitter.
+  Args:
+    operation (callable): A function performing one request and returning its response.
+    description (str): What the operation does, for log messages.
+    retries (int, optional): Maximum number of attempts. Defaults to 3.
+    backoff (float, optional): Base delay in seconds, doubled after each failed attempt. Defaults to 1.0.
+  Returns:
+    The operation's response.
+  Raises:
+    Exception: The last error, once all attempts have failed.
+  """
+
+  for attempt in range(1, retries + 1):
+    try:
+      return operation()
+    except Exception as e:
+      if attempt == retries:
+        raise
+      delay = backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+      logging.warning(f"{description} failed (attempt {attempt}/{retries}), retrying in {delay:.1f}s: {e}")
+      time.sleep(delay)
+
+def _to_json_records(df: pd.DataFrame) -> list:
+  """
+  Converts a cleaned DataFrame, typed or not, to JSON-ready records.
+  Numpy, nullable and Arrow values become plain Python values, and missing values become None.
+  Args:
+    df (pd.DataFrame): The rows to convert.
+  Returns:
+    list: One dict per row.
+  """
+  return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
 # Upload cleaned flyer data to the database
-def upload_clean_data(clean_data: pd.DataFrame, valid_from: str, valid_until: str) -> None:
+def upload_clean_data(
+  clean_data: pd.DataFrame,
+  valid_from: str,
+  valid_until: str,
+  store: str = "safeway",
+  chunk_size: int = 500,
+  max_workers: int = 4,
+  retries: int = 3,
+  backoff: float = 1.0,
+) -> int:
   """
   Uploads cleaned data to the database.
-  This function inserts flyer data into the 'flyers' table and the corresponding
-  product data into the 'flyer_products' table in the database. If the insertion
-  of product data fails, it attempts to delete the previously inserted flyer data.
+  This function upserts the flyer into the 'flyers' table on its natural key
+  (store, valid_from, valid_until), then upserts the product rows into the
+  'flyer_products' table in chunks, on a bounded thread pool, retrying each chunk
+  with backoff. Products are keyed on (flyer_id, product, deal, price), so
+  re-running an upload is idempotent: it never creates a duplicate flyer or
+  duplicate products, and it fills in chunks a previous run failed to send.
   Args:
-    clean_data (pd.DataFrame): A DataFrame containing the cleaned product data.
+    clean_data (pd.DataFrame): A DataFrame containing the cleaned product data, from clean_data with or without typed=True.
     valid_from (str): The start date for the flyer validity period.
     valid_until (str): The end date for the flyer validity period.
+    store (str, optional): The store the flyer belongs to. Defaults to "safeway".
+    chunk_size (int, optional): Number of products sent per request. Defaults to 500.
+    max_workers (int, optional): Number of chunks uploaded in parallel. Defaults to 4.
+    retries (int, optional): Attempts per request. Defaults to 3.
+    backoff (float, optional): Base retry delay in seconds. Defaults to 1.0.
+  Returns:
+    int: The ID of the flyer.
   Raises:
-    RuntimeError: If inserting flyer data or product data into the database fails.
+    RuntimeError: If upserting the flyer fails, or if any product chunk still fails after its retries.
+  Note:
+    The upserts need unique indexes on flyers (store, valid_from, valid_until) and on
+    flyer_products (flyer_id, product, deal, price), the latter with NULLS NOT DISTINCT
+    since most products have no deal. Apply supabase/migrations/20250401000000_flyer_upsert_keys.sql
+    before the first upload. Products repeating a key within the flyer are sent once, with a warning.
   """
   
   
-  # Insert into flyers table
+  supabase = get_client()
+
+  # Upsert into flyers table
   flyer_data = {
-    "store": "safeway",
+    "store": store,
     "valid_from": valid_from,
     "valid_until": valid_until
   }
   
-  flyer_response = supabase.table("flyers").insert(flyer_data).execute()
+  flyer_response = _with_retries(
+    lambda: supabase.table("flyers").upsert(flyer_data, on_conflict=",".join(FLYER_KEY)).execute(),
+    "Flyer upsert",
+    retries,
+    backoff,
+  )
   if not flyer_response.data or len(flyer_response.data) == 0:
     raise RuntimeError("Failed to insert flyer data into the database.")
 
   flyer_id = flyer_response.data[0]["flyer_id"]
   
-  # Prepare products data
-  products_data = clean_data.to_dict(orient="records")
+  # Prepare products data; a statement may not upsert the same key twice
+  products = clean_data[FLYER_PRODUCT_COLUMNS]
+  duplicated = products.duplicated(subset=FLYER_PRODUCT_KEY[1:])
+  if duplicated.any():
+    logging.warning(
+      f"Dropping {int(duplicated.sum())}/{len(products)} flyer products that repeat a "
+      f"(product, deal, price) key for flyer {flyer_id}, e.g. {products[duplicated].iloc[0].to_dict()}"
+    )
+    products = products[~duplicated]
+  products_data = _to_json_records(products)
   for product in products_data:
     product["flyer_id"] = flyer_id
+
+  chunks = [products_data[i:i + chunk_size] for i in range(0, len(products_data), chunk_size)]
+
+  def upsert_chunk(chunk: list) -> None:
+    _with_retries(
+      lambda: supabase.table("flyer_products").upsert(chunk, on_conflict=",".join(FLYER_PRODUCT_KEY)).execute(),
+      f"Flyer products upsert ({len(chunk)} rows)",
+      retries,
+      backoff,
+    )
   
-  # Insert into products table
-  try:
-    supabase.table("flyer_products").insert(products_data).execute()
-  except Exception as e:
-    supabase.table("flyers").delete().eq("flyer_id", flyer_id).execute()
-    raise RuntimeError(f"Failed to insert flyer products into the database: {e}")
+  # Deferred: the Streamlit logger imports this module as db.database, outside the grocery_god package
+  from grocery_god.metrics import span
+
+  # Upsert into products table, chunks in parallel
+  failures = []
+  with span("upload_flyer_products", rows=len(products_data), chunks=len(chunks)) as s, \
+      ThreadPoolExecutor(max_workers=max_workers) as pool:
+    futures = [pool.submit(upsert_chunk, chunk) for chunk in chunks]
+    for future in as_completed(futures):
+      try:
+        future.result()
+      except Exception as e:
+        failures.append(e)
+    s.count(failed_chunks=len(failures))
+
+  if failures:
+    raise RuntimeError(
+      f"Failed to insert {len(failures)}/{len(chunks)} flyer product chunks for flyer {flyer_id}; "
+      f"re-run the upload to fill them in: {failures[0]}"
+    )
+
+  logging.info(f"Uploaded {len(products_data)} flyer products in {len(chunks)} chunks for flyer {flyer_id}")
+  return flyer_id
@@ -0,0 +1,360 @@
+"""
+Program Name: Grocery God Price History
+Description: Embedded SQLite mirror of the flyers, flyer_products, trips and trip_products tables, for fast offline price analysis.
+
+Modules:
+- re: For normalizing product names.
+- sqlite3: For the embedded store.
+- datetime: For the query windows.
+- pathlib.Path: For the default location.
+- pandas as pd: A powerful data analysis and manipulation library for Python.
+
+Functions:
+- normalize_product(name: str) -> str: Lowercases a product name and collapses punctuation and whitespace.
+
+Classes:
+- PriceHistory: The local store. Sync methods fill it from the pipeline outputs and from Supabase;
+    query methods answer price-history questions without the network.
+
+Usage:
+- history = PriceHistory()
+- history.sync_clean_flyer(clean_df, valid_from, valid_until)     # a pipeline output
+- history.sync_parquet()                                         # the clean Parquet dataset
+- history.sync_from_supabase()                                   # new flyers and trips since the last sync
+- history.lowest_unit_price("lucerne large eggs 12 ct", weeks=8)
+- history.price_history("lucerne large eggs 12 ct", since="2025-01-01")
+
+Note:
+- Flyers are keyed on (store, valid_from, valid_until), products on (flyer, product, deal, price),
+  as in Supabase, so re-syncing the same flyer from any source updates it in place. A flyer
+  synced from a local output gets a local flyer_id; remote_flyer_id is filled when it is pulled.
+- Trips keep their Supabase trip_id, and a trip's products are replaced as a whole when re-synced.
+- Stores are stored lowercased, so "Safeway" from the logger and "safeway" from the scraper match.
+- The Supabase sync re-pulls the newest flyer and trip on every run, so products uploaded in a later
+  retry of the same flyer still arrive; use full=True to re-pull everything.
+"""
+
+import re
+import sqlite3
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+PAGE_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS flyers (
+    flyer_id        INTEGER PRIMARY KEY,
+    remote_flyer_id INTEGER UNIQUE,
+    store           TEXT NOT NULL,
+    valid_from      TEXT NOT NULL,
+    valid_until     TEXT NOT NULL,
+    UNIQUE (store, valid_from, valid_until)
+);
+
+CREATE TABLE IF NOT EXISTS flyer_products (
+    flyer_id           INTEGER NOT NULL REFERENCES flyers (flyer_id) ON DELETE CASCADE,
+    product            TEXT NOT NULL,
+    deal               TEXT,
+    price              REAL,
+    units              INTEGER,
+    unit_price         REAL,
+    ounces             REAL,
+    normalized_product TEXT NOT NULL,
+    store              TEXT NOT NULL,
+    valid_from         TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS trips (
+    trip_id   INTEGER PRIMARY KEY,
+    store     TEXT NOT NULL,
+    trip_date TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS trip_products (
+    trip_id            INTEGER NOT NULL REFERENCES trips (trip_id) ON DELETE CASCADE,
+    product            TEXT NOT NULL,
+    brand              TEXT,
+    price              REAL,
+    sale_price         INTEGER,
+    units              INTEGER,
+    ounces             REAL,
+    normalized_product TEXT NOT NULL,
+    store              TEXT NOT NULL,
+    trip_date          TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    source  TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS flyer_products_key
+    ON flyer_products (flyer_id, product, ifnull(deal, ''), ifnull(price, -1));
+CREATE INDEX IF NOT EXISTS flyer_products_lookup
+    ON flyer_products (normalized_product, store, valid_from);
+CREATE INDEX IF NOT EXISTS flyer_products_date
+    ON flyer_products (store, valid_from);
+CREATE INDEX IF NOT EXISTS trip_products_trip
+    ON trip_products (trip_id);
+CREATE INDEX IF NOT EXISTS trip_products_lookup
+    ON trip_products (normalized_product, store, trip_date);
+"""
+
+FLYER_PRODUCT_FIELDS = ["product", "deal", "price", "units", "unit_price", "ounces"]
+TRIP_PRODUCT_FIELDS = ["product", "brand", "price", "sale_price", "units", "ounces"]
+
+_NON_WORD_RX = re.compile(r"[^a-z0-9%.]+")
+
+
+def normalize_product(name: str) -> str:
+    return _NON_WORD_RX.sub(" ", name.lower()).strip()
+
+
+def _records(df: pd.DataFrame, fields: list[str]) -> list[dict]:
+    # Typed or untyped clean frames; missing values become NULL
+    df = df.reindex(columns=fields)
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+class PriceHistory:
+
+    def __init__(self, path: str | None = None):
+        self.path = Path(path) if path else Path("./data") / "history.sqlite"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._db = sqlite3.connect(self.path)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(SCHEMA)
+
+    # --- Sync ---
+
+    def _upsert_flyer(self, store: str, valid_from: str, valid_until: str, remote_flyer_id: int | None = None) -> int:
+        row = self._db.execute(
+            """
+            INSERT INTO flyers (remote_flyer_id, store, valid_from, valid_until) VALUES (?, ?, ?, ?)
+            ON CONFLICT (store, valid_from, valid_until)
+                DO UPDATE SET remote_flyer_id = coalesce(excluded.remote_flyer_id, remote_flyer_id)
+            RETURNING flyer_id
+            """,
+            (remote_flyer_id, store.lower(), str(valid_from), str(valid_until)),
+        ).fetchone()
+        return row["flyer_id"]
+
+    def _upsert_flyer_products(self, flyer_id: int, store: str, valid_from: str, products: list[dict]) -> None:
+        self._db.executemany(
+            """
+            INSERT INTO flyer_products
+                (flyer_id, product, deal, price, units, unit_price, ounces, normalized_product, store, valid_from)
+            VALUES
+                (:flyer_id, :product, :deal, :price, :units, :unit_price, :ounces, :normalized_product, :store, :valid_from)
+            ON CONFLICT (flyer_id, product, ifnull(deal, ''), ifnull(price, -1))
+                DO UPDATE SET units = excluded.units, unit_price = excluded.unit_price, ounces = excluded.ounces
+            """,
+            [
+                {
+                    **{field: product.get(field) for field in FLYER_PRODUCT_FIELDS},
+                    "flyer_id": flyer_id,
+                    "normalized_product": normalize_product(product["product"]),
+                    "store": store.lower(),
+                    "valid_from": str(valid_from),
+                }
+                for product in products
+            ],
+        )
+
+    def sync_clean_flyer(
+        self,
+        clean_data: pd.DataFrame,
+        valid_from: str,
+        valid_until: str,
+        store: str = "safeway",
+        remote_flyer_id: int | None = None,
+    ) -> int:
+        """Mirrors one cleaned flyer (the output of clean_data) and returns its local flyer_id."""
+
+        with self._db:
+            flyer_id = self._upsert_flyer(store, valid_from, valid_until, remote_flyer_id)
+            self._upsert_flyer_products(flyer_id, store, valid_from, _records(clean_data, FLYER_PRODUCT_FIELDS))
+        return flyer_id
+
+    def sync_parquet(self, root: str | None = None, since: str | None = None) -> int:
+        """Mirrors the weeks of the clean Parquet dataset (see db.columnar) and returns how many were synced."""
+
+        from grocery_god.db.columnar import CLEAN_ROOT, read_clean
+
+        df = read_clean(root or CLEAN_ROOT, columns=FLYER_PRODUCT_FIELDS + ["store", "valid_from", "valid_until"], since=since)
+        weeks = df.groupby(["store", "valid_from", "valid_until"], sort=True)
+        for (store, valid_from, valid_until), week in weeks:
+            self.sync_clean_flyer(week, str(valid_from), str(valid_until), store=store)
+        return weeks.ngroups
+
+    def sync_trip(self, trip: dict, products: list[dict]) -> None:
+        """Mirrors one trip and its products, e.g. right after db.database.insert_trip_data."""
+
+        store, trip_date = trip["store"].lower(), str(trip["trip_date"])
+        with self._db:
+            self._db.execute(
+                "INSERT INTO trips (trip_id, store, trip_date) VALUES (?, ?, ?) "
+                "ON CONFLICT (trip_id) DO UPDATE SET store = excluded.store, trip_date = excluded.trip_date",
+                (trip["trip_id"], store, trip_date),
+            )
+            self._db.execute("DELETE FROM trip_products WHERE trip_id = ?", (trip["trip_id"],))
+            self._db.executemany(
+                """
+                INSERT INTO trip_products
+                    (trip_id, product, brand, price, sale_price, units, ounces, normalized_product, store, trip_date)
+                VALUES
+                    (:trip_id, :product, :brand, :price, :sale_price, :units, :ounces, :normalized_product, :store, :trip_date)
+                """,
+                [
+                    {
+                        **{field: product.get(field) for field in TRIP_PRODUCT_FIELDS},
+                        "trip_id": trip["trip_id"],
+                        "normalized_product": normalize_product(product["product"]),
+                        "store": store,
+                        "trip_date": trip_date,
+                    }
+                    for product in products
+                ],
+            )
+
+    def _last_id(self, source: str) -> int:
+        row = self._db.execute("SELECT last_id FROM sync_state WHERE source = ?", (source,)).fetchone()
+        return row["last_id"] if row else 0
+
+    def _set_last_id(self, source: str, last_id: int) -> None:
+        with self._db:
+            self._db.execute(
+                "INSERT INTO sync_state (source, last_id) VALUES (?, ?) "
+                "ON CONFLICT (source) DO UPDATE SET last_id = excluded.last_id",
+                (source, last_id),
+            )
+
+    @staticmethod
+    def _fetch_all(query) -> list[dict]:
+        # PostgREST caps rows per response, so page through with range()
+        rows, start = [], 0
+        while True:
+            page = query.range(start, start + PAGE_SIZE - 1).execute().data
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return rows
+            start += PAGE_SIZE
+
+    def sync_from_supabase(self, client=None, full: bool = False) -> dict:
+        """Pulls flyers and trips added since the last sync; returns how many of each were synced."""
+
+        if client is None:
+            from grocery_god.db.database import get_client
+
+            client = get_client()
+
+        last_flyer = 0 if full else self._last_id("flyers")
+        flyers = self._fetch_all(
+            client.table("flyers").select("*").gte("flyer_id", last_flyer).order("flyer_id")
+        )
+        for flyer in flyers:
+            products = self._fetch_all(
+                client.table("flyer_products").select("*").eq("flyer_id", flyer["flyer_id"]).order("product")
+            )
+            with self._db:
+                flyer_id = self._upsert_flyer(
+                    flyer["store"], flyer["valid_from"], flyer["valid_until"], flyer["flyer_id"]
+                )
+                self._upsert_flyer_products(flyer_id, flyer["store"], flyer["valid_from"], products)
+        if flyers:
+            self._set_last_id("flyers", flyers[-1]["flyer_id"])
+
+        last_trip = 0 if full else self._last_id("trips")
+        trips = self._fetch_all(
+            client.table("trips").select("*").gte("trip_id", last_trip).order("trip_id")
+        )
+        for trip in trips:
+            products = self._fetch_all(
+                client.table("trip_products").select("*").eq("trip_id", trip["trip_id"]).order("product")
+            )
+            self.sync_trip(trip, products)
+        if trips:
+            self._set_last_id("trips", trips[-1]["trip_id"])
+
+        return {"flyers": len(flyers), "trips": len(trips)}
+
+    # --- Queries ---
+
+    def lowest_unit_price(
+        self,
+        product: str,
+        weeks: int = 4,
+        store: str | None = None,
+        today: date | None = None,
+        include_trips: bool = False,
+    ) -> dict | None:
+        """Cheapest unit price of a product over the last `weeks` weeks, with where and when it was seen."""
+
+        since = str((today or date.today()) - timedelta(weeks=weeks))
+        params = {"product": normalize_product(product), "since": since, "store": store and store.lower()}
+
+        query = """
+            SELECT 'flyer' AS source, store, valid_from AS date, product, deal, unit_price
+            FROM flyer_products
+            WHERE normalized_product = :product AND valid_from >= :since
+              AND (:store IS NULL OR store = :store) AND unit_price IS NOT NULL
+        """
+        if include_trips:
+            query += """
+            UNION ALL
+            SELECT 'trip', store, trip_date, product, NULL, round(price / coalesce(nullif(units, 0), 1), 2)
+            FROM trip_products
+            WHERE normalized_product = :product AND trip_date >= :since
+              AND (:store IS NULL OR store = :store) AND price IS NOT NULL
+            """
+        query += " ORDER BY unit_price, date DESC LIMIT 1"
+
+        row = self._db.execute(query, params).fetchone()
+        return dict(row) if row else None
+
+    def price_history(self, product: str, since: str | None = None, store: str | None = None) -> pd.DataFrame:
+        """Every flyer row of a product, oldest first."""
+
+        return pd.read_sql_query(
+            """
+            SELECT store, valid_from, product, deal, price, units, unit_price, ounces
+            FROM flyer_products
+            WHERE normalized_product = :product
+              AND (:since IS NULL OR valid_from >= :since)
+              AND (:store IS NULL OR store = :store)
+            ORDER BY valid_from, store
+            """,
+            self._db,
+            params={"product": normalize_product(product), "since": since, "store": store and store.lower()},
+        )
+
+    def new_flyer_products(self, after_rowid: int = 0) -> list[tuple[int, str]]:
+        """(rowid, normalized_product) of flyer rows added after `after_rowid`, oldest first."""
+
+        return [
+            tuple(row)
+            for row in self._db.execute(
+                "SELECT rowid, normalized_product FROM flyer_products WHERE rowid > ? ORDER BY rowid",
+                (after_rowid,),
+            )
+        ]
+
+    def trip_products(self, trip_id: int | None = None) -> list[dict]:
+        """Logged products of one trip, or of every trip."""
+
+        return [
+            dict(row)
+            for row in self._db.execute(
+                "SELECT trip_id, product, brand, price, units FROM trip_products "
+                "WHERE :trip_id IS NULL OR trip_id = :trip_id ORDER BY trip_id, rowid",
+                {"trip_id": trip_id},
+            )
+        ]
+
+    def close(self) -> None:
+        self._db.close()
@@ -29,7 +29,7 @@ Note:
 
 import streamlit as st
 from datetime import datetime
-from db.database import supabase, insert_trip_data, fetch_trip_data, fetch_trip_products
+from db.database import insert_trip_data, fetch_trip_data, fetch_trip_products
 
 
 # --- INIT Functions ---
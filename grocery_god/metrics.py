@@ -0,0 +1,178 @@
+"""
+Lightweight spans and metrics for the Grocery God pipelines.
+
+A span wraps one stage (browser launch, page load, extraction, parse, clean, export,
+upload...) and records its wall time, the process's memory and any item counts the
+stage reports. Each finished span is written as one JSON log line on the
+"grocery_god.metrics" logger, and added to per-stage totals that summary() returns
+for the Lambda response. Only the totals are kept, so long-lived processes that never
+call reset() hold one entry per stage name, not one per span. Nested spans are named
+after their parents ("scrape.goto").
+
+Memory:
+    rss_mb is the resident set size when the span ends. peak_rss_mb is the process's
+    high-water mark at that point, and peak_rss_delta_mb how much the span raised it,
+    which points at the stage that set the peak. Chromium runs in its own processes,
+    so browser memory is not included.
+
+Set GROCERY_GOD_METRICS=0 to turn recording off; spans then cost a function call.
+
+Functions:
+    span(name: str, **counts) -> ContextManager[Span]: Records one stage.
+    summary() -> dict: Per-stage totals of the spans recorded since the last reset().
+    reset() -> None: Forgets recorded spans, e.g. at the start of a warm Lambda invocation.
+    log_summary() -> None: Writes summary() as one JSON log line.
+    configure_logging(level: int = logging.INFO) -> None: Sends the span log lines to stderr at `level`,
+        for entry points (such as the Lambda handler) where nothing else configures logging.
+
+Usage:
+    with span("clean", rows_in=len(df)) as s:
+        df = clean_data(df)
+        s.count(rows_out=len(df))
+"""
+
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger("grocery_god.metrics")
+
+ENABLED = os.getenv("GROCERY_GOD_METRICS", "1") != "0"
+
+_PAGE_MB = os.sysconf("SC_PAGE_SIZE") / 1e6 if hasattr(os, "sysconf") else 0.0
+
+_stages = {}
+_lock = threading.Lock()
+_parent: ContextVar[str | None] = ContextVar("grocery_god_span", default=None)
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_MB
+    except OSError:
+        return 0.0
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 / 1e6
+
+
+class Span:
+
+    def __init__(self, name: str, counts: dict):
+        self.name = name
+        self.counts = dict(counts)
+
+    def count(self, **counts) -> None:
+        self.counts.update(counts)
+
+
+class _NullSpan:
+
+    def count(self, **counts) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+@contextmanager
+def span(name: str, **counts):
+    if not ENABLED:
+        yield _NULL_SPAN
+        return
+
+    parent = _parent.get()
+    full_name = f"{parent}.{name}" if parent else name
+    token = _parent.set(full_name)
+
+    current = Span(full_name, counts)
+    peak_before = _peak_rss_mb()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        wall_s = time.perf_counter() - start
+        _parent.reset(token)
+
+        peak_after = _peak_rss_mb()
+        record = {
+            "span": full_name,
+            "wall_s": round(wall_s, 4),
+            "rss_mb": round(_rss_mb(), 1),
+            "peak_rss_mb": round(peak_after, 1),
+            "peak_rss_delta_mb": round(peak_after - peak_before, 1),
+            **current.counts,
+        }
+        if error:
+            record["error"] = error
+
+        with _lock:
+            _add(record)
+        logger.info(json.dumps(record, default=str))
+
+
+def _add(record: dict) -> None:
+    # Caller holds _lock
+    stage = _stages.setdefault(
+        record["span"], {"calls": 0, "wall_s": 0.0, "peak_rss_mb": 0.0, "peak_rss_delta_mb": 0.0}
+    )
+    stage["calls"] += 1
+    stage["wall_s"] = round(stage["wall_s"] + record["wall_s"], 4)
+    stage["peak_rss_mb"] = max(stage["peak_rss_mb"], record["peak_rss_mb"])
+    stage["peak_rss_delta_mb"] = round(stage["peak_rss_delta_mb"] + record["peak_rss_delta_mb"], 1)
+
+    # Item counts add up across calls; errors are counted
+    for key, value in record.items():
+        if key in ("span", "wall_s", "rss_mb", "peak_rss_mb", "peak_rss_delta_mb"):
+            continue
+        if key == "error":
+            stage["errors"] = stage.get("errors", 0) + 1
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            stage[key] = stage.get(key, 0) + value
+        else:
+            stage[key] = value
+
+
+def reset() -> None:
+    with _lock:
+        _stages.clear()
+
+
+def summary() -> dict:
+    """Per-stage totals, in the order each stage first finished."""
+
+    with _lock:
+        stages = {name: dict(stage) for name, stage in _stages.items()}
+
+    return {"enabled": ENABLED, "peak_rss_mb": round(_peak_rss_mb(), 1), "stages": stages}
+
+
+def log_summary() -> None:
+    if ENABLED:
+        logger.info(json.dumps({"metrics_summary": summary()}, default=str))
+
+
+def configure_logging(level: int = logging.INFO) -> None:
+
+    logger.setLevel(level)
+    if not any(getattr(handler, "_grocery_god_metrics", False) for handler in logger.handlers):
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        handler._grocery_god_metrics = True
+        logger.addHandler(handler)
+
+    # The handler above writes each line once; the root logger's (e.g. Lambda's) would repeat it
+    logger.propagate = False
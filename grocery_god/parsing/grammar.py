@@ -0,0 +1,83 @@
+"""
+Program Name: Grocery God Parser Grammar
+Description: Per-store keyword and discard rules used by the parser to sort raw flyer labels.
+
+Modules:
+- re: Provides regular expression matching operations.
+
+Classes:
+- Grammar: Compiles a store's deal keywords into one alternation pattern, and its discard
+    rules into another, so each row is classified in a single pass.
+
+Functions:
+- register_grammar(store: str, grammar: Grammar) -> None: Registers the grammar used for a store.
+- get_grammar(store: str) -> Grammar: Returns the grammar registered for a store.
+
+Usage:
+- Build a `Grammar` for a new chain and call `register_grammar("chain", grammar)`, then pass
+  `store="chain"` to `parser.sort_data` / `parser.setup_df`.
+
+Note:
+- Discard patterns must stay RE2 compatible (no lookarounds or backreferences), since the
+  vectorized sorter runs them through pyarrow.
+"""
+
+import re
+from typing import Iterator
+
+
+class Grammar:
+
+    def __init__(self, keywords: list[str], discard_patterns: list[str]):
+        self.keywords = list(keywords)
+        self.discard_patterns = list(discard_patterns)
+
+        # Keywords are tried earliest first; ties at the same position go to the first listed keyword
+        self.keyword_pattern = "|".join(re.escape(kw) for kw in self.keywords)
+        self.discard_pattern = "|".join(f"(?:{p})" for p in self.discard_patterns)
+
+        self.keyword_rx = re.compile(self.keyword_pattern) if self.keywords else None
+        self.discard_rx = re.compile(self.discard_pattern) if self.discard_patterns else None
+
+    def is_discarded(self, row: str) -> bool:
+        return self.discard_rx is not None and self.discard_rx.search(row) is not None
+
+    def iter_keywords(self, row: str) -> Iterator[tuple[int, str]]:
+        if self.keyword_rx is None:
+            return
+        for match in self.keyword_rx.finditer(row):
+            yield match.start(), match.group(0)
+
+
+GRAMMARS: dict[str, Grammar] = {}
+
+
+def register_grammar(store: str, grammar: Grammar) -> None:
+    GRAMMARS[store.lower()] = grammar
+
+
+def get_grammar(store: str) -> Grammar:
+    try:
+        return GRAMMARS[store.lower()]
+    except KeyError:
+        raise ValueError(f"No parser grammar registered for store '{store}'.")
+
+
+SAFEWAY_GRAMMAR = Grammar(
+    keywords=[
+        ", buy ",
+        ", free ",
+        ", earn ",
+        ", up ",
+        ", get ",
+        ", celebrate with ",
+        ", spend $",
+    ],
+    discard_patterns=[
+        r"save ",
+        r", \$\d+(?:\.\d+)? off ",
+        r", \d+% off",
+    ],
+)
+
+register_grammar("safeway", SAFEWAY_GRAMMAR)
@@ -5,29 +5,63 @@ Author: Jack Dawson
 Date: 3/12/2025
 
 Modules:
-- re: Provides regular expression matching operations.
 - pandas as pd: A powerful data analysis and manipulation library for Python.
+- pyarrow as pa: Arrow-backed string columns for the vectorized sorter.
+- grocery_god.parsing.grammar: Per-store keyword and discard rules.
+- grocery_god.db.columnar: Parquet datasets of raw scrapes.
+- grocery_god.metrics: Stage timing and row counts.
 
 Functions:
-- parse_row(row: str, keyword: str) -> list[str, str, float]: 
-    Parses a row of data to extract product, deal, and price information based on a keyword.
-- sort_data(raw_data: pd.Series) -> tuple[list[str], list[str], list[str]]: 
+- setup_df(file_path: str, vectorized: bool = False, store: str = "safeway") -> pd.DataFrame:
+    Reads a raw scrape CSV and sorts it into a product/deal/price DataFrame.
+- iter_setup_df(file_path: str, chunksize: int = 50_000, vectorized: bool = False, store: str = "safeway") -> Iterator[pd.DataFrame]:
+    Same as `setup_df`, but reads and sorts the raw scrape one chunk at a time.
+- setup_dataset(root: str = RAW_ROOT, store: str = "safeway", since: str | None = None, until: str | None = None, vectorized: bool = False) -> pd.DataFrame:
+    Same as `setup_df`, for many weeks of raw scrapes read from the Parquet dataset, with a valid_from column.
+- parse_row(row: str, keyword: str, start: int | None = None) -> list[str, str, float]: 
+    Parses a row of data to extract product, deal, and price information based on a keyword
+    (split at `start` when given, else at the keyword's first occurrence).
+- sort_row(row: str, grammar: Grammar) -> tuple[str, str | None, str] | None: 
+    Sorts one lowercased raw row into (product, deal, price), or None if the row is discarded.
+    A row with several keywords is split at the earliest one that leaves a "deal, price" tail.
+- sort_data(raw_data: pd.Series, vectorized: bool = False, store: str = "safeway") -> tuple[list[str], list[str], list[str]]: 
     Sorts raw data into lists of products, deals, and prices, filtering out unwanted rows.
+    Keywords and discard rules come from the store's registered grammar (see parsing.grammar).
+- sort_data_vectorized(raw_data: pd.Series, store: str = "safeway") -> tuple[list[str], list[str], list[str]]: 
+    Same output as `sort_data`, computed in bulk with pandas `.str` operations.
 
 Usage:
 - Call the `sort_data` function with a pandas Series containing raw grocery data.
+- Every entry point sorts row by row unless `vectorized=True` is passed. The two modes give the same
+  rows (see tests/test_parser.py); the vectorized one only pulls ahead on batches of a few hundred
+  thousand rows and is slower on a single week's flyer, so measure before switching
+  (python -m grocery_god.benchmarks.sort_data).
 """
 
-import re
+from typing import Iterator
+
 import pandas as pd
+import pyarrow as pa
+
+from grocery_god.db.columnar import RAW_ROOT, read_raw
+from grocery_god.metrics import span
+from grocery_god.parsing.grammar import Grammar, get_grammar
+
 
-def setup_df(file_path: str) -> pd.DataFrame:
+def setup_df(
+    file_path: str, vectorized: bool = False, store: str = "safeway"
+) -> pd.DataFrame:
 
-    # Read Flyer
-    raw_df = pd.read_csv(file_path, names=["Raw Data"])
+    with span("setup_df") as s:
 
-    # Sort Flyer
-    products, deals, prices = sort_data(raw_df["Raw Data"])
+        # Read Flyer
+        raw_df = pd.read_csv(file_path, names=["Raw Data"])
+
+        # Sort Flyer
+        products, deals, prices = sort_data(
+            raw_df["Raw Data"], vectorized=vectorized, store=store
+        )
+        s.count(rows_in=len(raw_df), rows_out=len(products))
 
     # Construct DataFrame
     df = pd.DataFrame(
@@ -40,8 +74,70 @@ def setup_df(file_path: str) -> pd.DataFrame:
 
     return df
 
-def parse_row(row: str, keyword: str) -> list[str, str, float]:
-    product, rest = row.split(keyword, 1)
+
+def iter_setup_df(
+    file_path: str, chunksize: int = 50_000, vectorized: bool = False, store: str = "safeway"
+) -> Iterator[pd.DataFrame]:
+
+    # Read Flyer, one chunk at a time so memory depends on chunksize only
+    with pd.read_csv(file_path, names=["Raw Data"], chunksize=chunksize) as reader:
+        for raw_df in reader:
+
+            # Sort Chunk
+            products, deals, prices = sort_data(
+                raw_df["Raw Data"], vectorized=vectorized, store=store
+            )
+
+            yield pd.DataFrame(
+                {
+                    "product": products,
+                    "deal": deals,
+                    "price": prices,
+                }
+            )
+
+def setup_dataset(
+    root: str = RAW_ROOT,
+    store: str = "safeway",
+    since: str | None = None,
+    until: str | None = None,
+    vectorized: bool = False,
+) -> pd.DataFrame:
+
+    # Read only the label columns of the requested weeks
+    raw_df = read_raw(
+        root, columns=["valid_from", "position", "label"], store=store, since=since, until=until
+    ).sort_values(["valid_from", "position"])
+
+    # Sort each week's flyer, keeping which week its rows came from
+    frames = []
+    for valid_from, week in raw_df.groupby("valid_from", sort=True):
+        products, deals, prices = sort_data(week["label"], vectorized=vectorized, store=store)
+        frames.append(
+            pd.DataFrame(
+                {
+                    "valid_from": valid_from,
+                    "product": products,
+                    "deal": deals,
+                    "price": prices,
+                }
+            )
+        )
+
+    if not frames:
+        return pd.DataFrame(columns=["valid_from", "product", "deal", "price"])
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def parse_row(row: str, keyword: str, start: int | None = None) -> list[str, str, float]:
+    if start is None:
+        product, rest = row.split(keyword, 1)
+    else:
+        product, rest = row[:start], row[start + len(keyword):]
+    if "," not in rest:
+        return None, None, None
+
     deal, price = rest.split(",", 1)
 
     if "," in price:
@@ -54,53 +150,108 @@ def parse_row(row: str, keyword: str) -> list[str, str, float]:
     return product, deal, price
 
 
-def sort_data(raw_data: pd.Series) -> tuple[list[str], list[str], list[str]]:
-    products, deals, prices = [], [], []
+def sort_row(row: str, grammar: Grammar) -> tuple[str, str | None, str] | None:
+
+    # Discard unwanted rows
+    if grammar.is_discarded(row):
+        return None
+
+    if row.endswith(", , "):
+        return None
+
+    # Rows we want
+    if ", , " in row:
+        product, price = row.split(", , ", 1)
+        if "," in price:
+            return None
+
+        return product.strip(), None, price.strip()
+
+    # Split at the earliest keyword that leaves a "deal, price" tail; in a label such as
+    # "x, buy 2, get 1 free, $3" the split at ", buy " is rejected and ", get " is used
+    for start, kw in grammar.iter_keywords(row):
+        product, deal, price = parse_row(row, kw, start)
+
+        if product or deal or price:
+            return product, deal, price
+
+    return None
+
 
-    keywords = [
-        ", buy ",
-        ", free ",
-        ", earn ",
-        ", up ",
-        ", get ",
-        ", celebrate with ",
-        ", spend $",
-    ]
+def sort_data(
+    raw_data: pd.Series, vectorized: bool = False, store: str = "safeway"
+) -> tuple[list[str], list[str], list[str]]:
+    if vectorized:
+        return sort_data_vectorized(raw_data, store=store)
+
+    grammar = get_grammar(store)
+    products, deals, prices = [], [], []
 
     for row in raw_data:
-        row = str(row).lower()
+        sorted_row = sort_row(str(row).lower(), grammar)
+
+        if sorted_row:
+            product, deal, price = sorted_row
+            products.append(product)
+            deals.append(deal)
+            prices.append(price)
+
+    return products, deals, prices
+
+
+def _split_once(rows: pd.Series, sep: str) -> tuple[pd.Series, pd.Series]:
+    missing = pd.Series(pd.NA, index=rows.index, dtype=rows.dtype)
+    if rows.empty:
+        return missing, missing
+
+    parts = rows.str.split(sep, n=1, expand=True, regex=False)
+    return parts.get(0, missing), parts.get(1, missing)
 
-        # Discard unwanted rows
-        if "save " in row:
-            continue
 
-        if re.search(r", \$\d+\.\d+ off ", row) or re.search(r", \$\d+ off ", row):
-            continue
+def sort_data_vectorized(
+    raw_data: pd.Series, store: str = "safeway"
+) -> tuple[list[str], list[str], list[str]]:
+    grammar = get_grammar(store)
 
-        if re.search(r", \d+\% off", row):
-            continue
+    rows = raw_data.astype(str).astype(pd.ArrowDtype(pa.string())).str.lower()
+    rows = rows.reset_index(drop=True)
 
-        if row.endswith(", , "):
-            continue
+    # Discard unwanted rows
+    discard = rows.str.endswith(", , ")
+    if grammar.discard_rx is not None:
+        discard |= rows.str.contains(grammar.discard_pattern)
+    rows = rows[~discard]
 
-        # Rows we want
-        if ", , " in row:
-            product, price = row.split(", , ")
-            if "," in price:
-                continue
+    # Rows without a deal: "product, , price"
+    no_deal_mask = rows.str.contains(", , ", regex=False)
+    no_deal_product, no_deal_price = _split_once(rows[no_deal_mask], ", , ")
 
-            products.append(product.strip())
-            deals.append(None)
-            prices.append(price.strip())
+    # Keyword deals: split each row at its earliest keyword followed by exactly "deal, price",
+    # the same split sort_row falls back to
+    deal_rows = rows[~no_deal_mask]
+    if grammar.keyword_rx is not None:
+        parts = deal_rows.str.extract(
+            f"(?s)^(?P<product>.*?)(?P<keyword>{grammar.keyword_pattern})"
+            f"(?P<deal>[^,]*),(?P<price>[^,]*)$"
+        ).dropna(subset=["keyword"])
+        keyword, product, deal, price = (
+            parts["keyword"], parts["product"], parts["deal"], parts["price"]
+        )
+    else:
+        keyword = product = deal = price = deal_rows[:0]
+    deal = keyword.str.replace(",", "", regex=False).str.strip() + " " + deal.str.strip()
 
-        else:
-            for kw in keywords:
-                if kw in row:
-                    product, deal, price = parse_row(row, kw)
+    # Back to row order
+    df = pd.concat(
+        [
+            pd.DataFrame({"product": no_deal_product, "price": no_deal_price}),
+            pd.DataFrame({"product": product, "deal": deal, "price": price}),
+        ]
+    ).sort_index()
+    df = df[df["price"].notna() & ~df["price"].str.contains(",", regex=False).fillna(True)]
 
-                    if product or deal or price:
-                        products.append(product)
-                        deals.append(deal)
-                        prices.append(price)
+    products = df["product"].str.strip().to_numpy(object, na_value=None).tolist()
+    deals = df["deal"].to_numpy(object, na_value=None).tolist()
+    prices = df["price"].str.strip().to_numpy(object, na_value=None).tolist()
 
     return products, deals, prices
@@ -0,0 +1,79 @@
+"""
+Content-hash change detection for weekly-ad scrapes.
+
+The weekly ad usually stays the same between scheduled runs. The hash covers the
+date range and the sorted label list, so it ignores the order tiles render in.
+It is compared with the hash stored by the last run: in S3 object metadata for the
+Lambda, or in a local JSON manifest for local runs. When they match, export,
+upload and downstream cleaning can be skipped.
+
+Functions:
+    content_hash(products: list[str], valid_from: str, valid_until: str) -> str: Hash of one scrape.
+    s3_content_hash(s3, bucket: str, key: str) -> str | None: Hash stored on an existing S3 object.
+        A missing object, or a 403 from a role without s3:ListBucket (which S3 returns for
+        missing keys), counts as no stored hash.
+
+Classes:
+    LocalManifest: JSON file mapping output paths to the hash of their content.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+HASH_METADATA_KEY = "content-hash"
+
+
+def content_hash(products: list[str], valid_from: str, valid_until: str) -> str:
+    digest = hashlib.sha256(f"{valid_from} - {valid_until}".encode())
+    for product in sorted(products):
+        digest.update(b"\n")
+        digest.update(product.encode())
+    return digest.hexdigest()
+
+
+def s3_content_hash(s3, bucket: str, key: str) -> str | None:
+    try:
+        response = s3.head_object(Bucket=bucket, Key=key)
+    except s3.exceptions.ClientError as e:
+        code = e.response["Error"]["Code"]
+        if code in ("404", "NoSuchKey", "NotFound"):
+            return None
+        # Without s3:ListBucket, S3 answers 403 instead of 404 for a missing key
+        if code in ("403", "Forbidden", "AccessDenied"):
+            logging.warning(
+                "HEAD s3://%s/%s was denied; treating it as not uploaded yet. "
+                "Grant s3:ListBucket on the bucket to tell missing keys from denied ones.",
+                bucket, key,
+            )
+            return None
+        raise
+    return response.get("Metadata", {}).get(HASH_METADATA_KEY)
+
+
+class LocalManifest:
+
+    def __init__(self, path: str | None = None):
+        self.path = Path(path) if path else Path("./data") / "manifest.json"
+
+    def _load(self) -> dict:
+        if not self.path.exists():
+            return {}
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def get(self, key: str) -> str | None:
+        return self._load().get(key)
+
+    def set(self, key: str, digest: str) -> None:
+        manifest = self._load()
+        manifest[key] = digest
+
+        # Write then rename, so a crash never leaves a half-written manifest
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,97 @@
+"""
+Runs the Safeway pipeline for many targets (stores, regions, chains) on a process pool.
+
+Each target runs scrape -> parse -> clean -> export in its own worker process, with
+its outputs under <output_path>/<target name>/ (with parquet, also its Parquet
+datasets, partitioned by the target name). Workers keep their own warm browser,
+so a worker handling several targets only launches Chromium once. Results and
+failures are collected per target: one target failing never aborts the others.
+A target whose weekly ad is unchanged since its last run skips export and cleaning.
+
+Functions:
+    run_target_pipeline(target: ScrapeTarget, output_path: str | None = None, parquet: bool = EXPORT_PARQUET) -> dict:
+        Runs scrape -> parse -> clean -> export for one target.
+    run_pipelines(targets: list[ScrapeTarget], output_path: str | None = None, workers: int | None = None, parquet: bool = EXPORT_PARQUET) -> dict:
+        Fans the targets out over a process pool and returns {"results": ..., "failures": ...}.
+
+Usage:
+    python -m grocery_god.pipelines.fanout --workers 4 store-1=<url> store-2=<url>
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from grocery_god.pipelines.reprocess import write_clean_flyer
+from grocery_god.pipelines.safeway import EXPORT_PARQUET, run_safeway_pipeline_if_changed
+from grocery_god.scraping.safeway_async import ScrapeTarget
+
+
+def run_target_pipeline(
+    target: ScrapeTarget, output_path: str | None = None, parquet: bool = EXPORT_PARQUET
+) -> dict:
+
+    start = time.perf_counter()
+    target_path = Path(output_path or "./data") / target.name
+
+    scrape = run_safeway_pipeline_if_changed(
+        output_path=str(target_path), url=target.url, parquet=parquet, store=target.name
+    )
+    raw_path = scrape["path"]
+
+    # Unchanged weekly ad: the cleaned flyer from the last run is still current
+    clean_path = target_path / f"clean_{Path(raw_path).name}"
+    if not (scrape["unchanged"] and clean_path.exists()):
+        clean_path = write_clean_flyer(raw_path, output_path=str(target_path))
+
+    return {
+        "raw_path": raw_path,
+        "clean_path": str(clean_path),
+        "unchanged": scrape["unchanged"],
+        "content_hash": scrape["content_hash"],
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def run_pipelines(
+    targets: list[ScrapeTarget],
+    output_path: str | None = None,
+    workers: int | None = None,
+    parquet: bool = EXPORT_PARQUET,
+) -> dict:
+
+    results, failures = {}, {}
+
+    # Spawned workers start without the parent's Playwright state
+    with ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as pool:
+        futures = {
+            pool.submit(run_target_pipeline, target, output_path, parquet): target
+            for target in targets
+        }
+        for future in as_completed(futures):
+            target = futures[future]
+            try:
+                results[target.name] = future.result()
+            except Exception as e:
+                logging.error("Pipeline for %s failed: %r", target.name, e)
+                failures[target.name] = repr(e)
+
+    return {"results": results, "failures": failures}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Safeway pipeline for many targets.")
+    parser.add_argument("targets", nargs="+", help="name=url pairs, or bare names for the default weekly ad")
+    parser.add_argument("--output-path", default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    targets = [ScrapeTarget(*target.split("=", 1)) for target in args.targets]
+    print(run_pipelines(targets, output_path=args.output_path, workers=args.workers))
@@ -0,0 +1,109 @@
+"""
+Defines a streaming reprocessing pipeline for raw flyer scrapes.
+
+Raw scrape CSVs are read in chunks, parsed and cleaned chunk by chunk, and the
+cleaned rows are appended to an output CSV as they are produced. Peak memory
+depends on the chunk size, not on the size of the flyer, so a year of
+multi-store scrapes can be reprocessed in a small container.
+
+Functions:
+    iter_clean_flyer(file_path, chunksize=50_000, cache=None) -> Iterator[pd.DataFrame]:
+        Yields cleaned DataFrames for one raw scrape, one chunk at a time.
+    write_clean_flyer(file_path, output_path=None, chunksize=50_000, cache=None) -> str:
+        Streams one raw scrape into a cleaned CSV and returns its path.
+    run_reprocess_pipeline(file_paths, output_path=None, chunksize=50_000, cache=None) -> list[str]:
+        Reprocesses many raw scrapes, one after another.
+
+    Passing a `LabelCache` skips parsing and cleaning for labels already seen in earlier flyers.
+
+Usage:
+    python -m grocery_god.pipelines.reprocess data/weeklyad_*.csv --chunksize 20000
+"""
+
+import argparse
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+
+from grocery_god.parsing.parser import iter_setup_df
+from grocery_god.cleaning.cleaner import clean_data
+from grocery_god.cleaning.cache import LabelCache
+
+
+def iter_clean_flyer(
+    file_path: str, chunksize: int = 50_000, cache: LabelCache | None = None
+) -> Iterator[pd.DataFrame]:
+
+    # Labels seen before come straight from the cache
+    if cache is not None:
+        with pd.read_csv(file_path, names=["Raw Data"], chunksize=chunksize) as reader:
+            for raw_df in reader:
+                df = cache.clean_labels(raw_df["Raw Data"])
+                if not df.empty:
+                    yield df
+        return
+
+    for df in iter_setup_df(file_path, chunksize=chunksize):
+        if df.empty:
+            continue
+        yield clean_data(df)
+
+
+def write_clean_flyer(
+    file_path: str,
+    output_path: str | None = None,
+    chunksize: int = 50_000,
+    cache: LabelCache | None = None,
+) -> str:
+    """Write the cleaned flyer incrementally and return the path."""
+
+    filename = f"clean_{Path(file_path).name}"
+    if output_path is None:
+        output_path = Path("./data/clean") / filename
+    else:
+        output_path = Path(output_path) / filename
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(output_path, "w", newline="", encoding="utf-8") as f:
+        header = True
+        for df in iter_clean_flyer(file_path, chunksize=chunksize, cache=cache):
+            df.to_csv(f, header=header, index=False)
+            header = False
+
+    return str(output_path)
+
+
+def run_reprocess_pipeline(
+    file_paths: list[str],
+    output_path: str | None = None,
+    chunksize: int = 50_000,
+    cache: LabelCache | None = None,
+) -> list[str]:
+
+    return [
+        write_clean_flyer(file_path, output_path=output_path, chunksize=chunksize, cache=cache)
+        for file_path in file_paths
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reprocess raw flyer scrapes in chunks.")
+    parser.add_argument("file_paths", nargs="+")
+    parser.add_argument("--output-path", default=None)
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument("--cache-path", default=None)
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    cache = None if args.no_cache else LabelCache(args.cache_path)
+
+    for path in run_reprocess_pipeline(
+        args.file_paths, args.output_path, args.chunksize, cache=cache
+    ):
+        print(path)
+
+    if cache is not None:
+        print(cache.stats())
+        cache.close()
@@ -0,0 +1,90 @@
+"""
+Exports a weekly-ad scrape straight to S3, without a local file.
+
+The raw CSV (date range, then one label per row) is encoded into an in-memory
+buffer, optionally gzip-compressed, and sent with a single put_object. Outputs
+over the multipart threshold go through boto3's managed transfer, which splits
+them into parallel multipart uploads. Labels compress well, so gzip cuts the
+transfer to a fraction of the plain CSV.
+
+Functions:
+    encode_csv(all_products: list[str], valid_from: str, valid_until: str, compress: bool = False) -> bytes:
+        Encodes a scrape in the raw CSV format, gzipped when compress is set.
+    scrape_to_s3(s3, all_products, valid_from, valid_until, bucket, key, compress=False, metadata=None, ...) -> dict:
+        Uploads one scrape and returns {"bucket", "key", "bytes", "compressed"}.
+
+Usage:
+    scrape_to_s3(boto3.client("s3"), products, valid_from, valid_until, "my-bucket", "safeway/weeklyad_2025-01-01.csv.gz", compress=True)
+
+Note:
+    Set AWS_ENDPOINT_URL to point boto3 at a local S3 stand-in (e.g. moto in docker-compose).
+"""
+
+import gzip
+import io
+
+from grocery_god.metrics import span
+from grocery_god.scraping.safeway import write_csv_rows
+
+# put_object accepts up to 5 GB, but multipart retries parts instead of the whole body
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+
+
+def _write_csv(raw, all_products: list[str], valid_from: str, valid_until: str) -> None:
+    f = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    write_csv_rows(f, all_products, valid_from, valid_until)
+    f.flush()
+    # Detach, so the wrapper does not close the underlying stream
+    f.detach()
+
+
+def encode_csv(all_products: list[str], valid_from: str, valid_until: str, compress: bool = False) -> bytes:
+
+    buffer = io.BytesIO()
+
+    if compress:
+        # mtime=0 keeps the gzip bytes identical for identical scrapes
+        with gzip.GzipFile(fileobj=buffer, mode="wb", mtime=0) as raw:
+            _write_csv(raw, all_products, valid_from, valid_until)
+    else:
+        _write_csv(buffer, all_products, valid_from, valid_until)
+
+    return buffer.getvalue()
+
+
+def scrape_to_s3(
+    s3,
+    all_products: list[str],
+    valid_from: str,
+    valid_until: str,
+    bucket: str,
+    key: str,
+    compress: bool = False,
+    metadata: dict | None = None,
+    multipart_threshold: int = MULTIPART_THRESHOLD,
+) -> dict:
+
+    with span("encode_csv", rows=len(all_products)) as s:
+        body = encode_csv(all_products, valid_from, valid_until, compress=compress)
+        s.count(bytes=len(body))
+
+    extra_args = {"ContentType": "text/csv", "Metadata": metadata or {}}
+    if compress:
+        extra_args["ContentEncoding"] = "gzip"
+
+    multipart = len(body) >= multipart_threshold
+    with span("s3_upload", bytes=len(body), multipart=multipart):
+        if not multipart:
+            s3.put_object(Bucket=bucket, Key=key, Body=body, **extra_args)
+        else:
+            from boto3.s3.transfer import TransferConfig
+
+            s3.upload_fileobj(
+                io.BytesIO(body),
+                bucket,
+                key,
+                ExtraArgs=extra_args,
+                Config=TransferConfig(multipart_threshold=multipart_threshold),
+            )
+
+    return {"bucket": bucket, "key": key, "bytes": len(body), "compressed": compress}
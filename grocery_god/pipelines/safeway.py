@@ -5,27 +5,108 @@ It provides a function to run the Safeway scraping pipeline, which:
 - Scrapes product data and sale date ranges from Safeway using the scraping utilities.
 - Validates the presence of product data and date ranges.
 - Exports the scraped data to a CSV file.
+- Optionally (parquet=True, or EXPORT_PARQUET=1) also writes the scrape and its cleaned rows to the
+  Parquet datasets of grocery_god.db.columnar, under <output_path>/parquet/{raw,clean} and
+  partitioned by `store` (the fan-out target's name, so targets of the same week never overwrite
+  each other).
 
 Functions:
-    run_safeway_pipeline(output_path: str | None = None): Runs the Safeway scraping pipeline and exports results.
+    scrape_weekly_ad(url: str = WEEKLY_AD_URL): Scrapes and validates one weekly ad.
+    run_safeway_pipeline(output_path: str | None = None, url: str = WEEKLY_AD_URL, parquet: bool = EXPORT_PARQUET, store: str = "safeway"):
+        Runs the Safeway scraping pipeline and exports results.
+    run_safeway_pipeline_if_changed(output_path: str | None = None, url: str = WEEKLY_AD_URL, manifest: LocalManifest | None = None, parquet: bool = EXPORT_PARQUET, store: str = "safeway"):
+        Same as run_safeway_pipeline, but skips the exports when the ad matches the last run's content hash.
 
 Usage:
     Run this module as a script to execute the pipeline and save results.
+    Set SCRAPER_FIXTURE (and SCRAPER_FIXTURE_MODE=record) to record or replay the scraping
+    session instead of using the live site; see grocery_god.scraping.fixtures.
 """
 
-from grocery_god.scraping.safeway import scrape_safeway, scrape_to_csv
+import logging
+import os
+from pathlib import Path
 
+from grocery_god.metrics import span
+from grocery_god.pipelines.change_detection import LocalManifest, content_hash
+from grocery_god.scraping.fixtures import fixture_from_env
+from grocery_god.scraping.safeway import WEEKLY_AD_URL, scrape_safeway, scrape_to_csv
 
-def run_safeway_pipeline(output_path: str | None = None):
+EXPORT_PARQUET = os.getenv("EXPORT_PARQUET") == "1"
 
-    all_products, valid_from, valid_until = scrape_safeway()
+
+def scrape_weekly_ad(url: str = WEEKLY_AD_URL):
+
+    all_products, valid_from, valid_until = scrape_safeway(url=url, fixture=fixture_from_env())
 
     if not valid_from or not valid_until:
         raise ValueError("Scraping completed but date range is missing.")
     if not all_products:
         raise ValueError("Scraping completed but no products were found.")
 
-    return scrape_to_csv(all_products, valid_from, valid_until, output_path=output_path)
+    return all_products, valid_from, valid_until
+
+
+def _export_parquet(all_products, valid_from, valid_until, output_path, store) -> None:
+
+    # Deferred: pyarrow and the parsing stack are only needed for this export
+    from grocery_god.db.columnar import export_scrape
+
+    root = Path(output_path or "./data") / "parquet"
+    with span("export_parquet", rows=len(all_products)):
+        raw_path, clean_path = export_scrape(
+            all_products,
+            valid_from,
+            valid_until,
+            raw_root=str(root / "raw"),
+            clean_root=str(root / "clean"),
+            store=store,
+            grammar="safeway",
+        )
+    logging.info("Wrote Parquet partitions %s and %s", raw_path, clean_path)
+
+
+def run_safeway_pipeline(
+    output_path: str | None = None,
+    url: str = WEEKLY_AD_URL,
+    parquet: bool = EXPORT_PARQUET,
+    store: str = "safeway",
+):
+
+    all_products, valid_from, valid_until = scrape_weekly_ad(url)
+
+    path = scrape_to_csv(all_products, valid_from, valid_until, output_path=output_path)
+    if parquet:
+        _export_parquet(all_products, valid_from, valid_until, output_path, store)
+
+    return path
+
+
+def run_safeway_pipeline_if_changed(
+    output_path: str | None = None,
+    url: str = WEEKLY_AD_URL,
+    manifest: LocalManifest | None = None,
+    parquet: bool = EXPORT_PARQUET,
+    store: str = "safeway",
+) -> dict:
+
+    all_products, valid_from, valid_until = scrape_weekly_ad(url)
+
+    digest = content_hash(all_products, valid_from, valid_until)
+    manifest = manifest or LocalManifest(Path(output_path or "./data") / "manifest.json")
+    filename = f"weeklyad_{valid_from}.csv"
+    existing_path = Path(output_path or "./data") / filename
+
+    if manifest.get(filename) == digest and existing_path.exists():
+        logging.info("Weekly ad %s unchanged (%s), skipping export.", filename, digest[:12])
+        return {"path": str(existing_path), "unchanged": True, "content_hash": digest}
+
+    path = scrape_to_csv(all_products, valid_from, valid_until, output_path=output_path)
+    if parquet:
+        _export_parquet(all_products, valid_from, valid_until, output_path, store)
+    manifest.set(filename, digest)
+
+    return {"path": path, "unchanged": False, "content_hash": digest}
 
 
 if __name__ == "__main__":
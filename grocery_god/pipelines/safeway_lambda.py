@@ -1,36 +1,101 @@
 """
 Defines an AWS Lambda handler for executing the Safeway data pipeline and uploading its output to an S3 bucket.
 
-The handler function runs the Safeway pipeline, stores the resulting file in a temporary directory, and uploads it to a specified S3 bucket and prefix. The S3 bucket and prefix are configured via environment variables 'OUTPUT_BUCKET' and 'OUTPUT_PREFIX'. The function returns a dictionary containing the S3 bucket name, object key, and the local temporary file path.
+The handler function scrapes the Safeway weekly ad and hashes its content. If the S3 object for that week already carries the same content hash, the run is a no-op: nothing is written or uploaded. Otherwise the CSV is encoded in memory, optionally gzip-compressed, and put directly to the specified S3 bucket and prefix, with the hash stored in the object's metadata; nothing is written to /tmp. The S3 bucket and prefix are configured via environment variables 'OUTPUT_BUCKET' and 'OUTPUT_PREFIX'. The function returns a dictionary containing the S3 bucket name, object key, the number of bytes uploaded (0 on a no-op), whether the run was a no-op ('unchanged'), and the content hash.
+
+Importing this module is kept cheap for cold starts: boto3 and the Playwright scraping stack are imported, and the S3 client created, on first use inside the handler. See grocery_god.pipelines.startup for the PREWARM_IMPORTS and PROFILE_IMPORTS startup modes. With profiling on, the response also carries an 'imports' breakdown.
 
 Dependencies:
 - boto3: For interacting with AWS S3.
-- pathlib: For file path manipulations.
 - grocery_god.pipelines.safeway: Contains the pipeline logic.
+- grocery_god.pipelines.change_detection: Content hashing of scrapes.
+- grocery_god.pipelines.s3_export: In-memory CSV export to S3.
+- grocery_god.pipelines.startup: Deferred imports and import profiling.
+- grocery_god.metrics: Per-stage wall time, memory and counts, returned under 'metrics'.
 
 Environment Variables:
 - OUTPUT_BUCKET: Name of the S3 bucket to upload the output.
 - OUTPUT_PREFIX: Prefix (folder path) in the S3 bucket for the uploaded file.
+- OUTPUT_GZIP: Set to 1 to upload gzip-compressed CSV, under a '.csv.gz' key.
+- AWS_ENDPOINT_URL: Optional S3 endpoint override, e.g. a local moto server.
+- PREWARM_IMPORTS: Set to 1 to import boto3 and Playwright at init instead of on first use.
+- PROFILE_IMPORTS: Set to 1 to log and return a per-module import-time breakdown.
+- GROCERY_GOD_METRICS: Set to 0 to turn off per-stage metrics.
+
+IAM:
+- s3:PutObject and s3:GetObject on the output prefix, and s3:ListBucket on the bucket. Without
+  ListBucket, S3 answers 403 instead of 404 for the first run of a week; that is treated as a miss,
+  but a real permission problem then only shows up when the upload fails.
 """
 
 import os
-import boto3
-import pathlib
+import logging
+from functools import lru_cache
 
-from grocery_god.pipelines.safeway import run_safeway_pipeline
+from grocery_god.pipelines.startup import ImportProfiler, prewarm
 
-s3 = boto3.client("s3")
+# Installed first, so it sees every import the handler path makes
+profiler = ImportProfiler().install() if os.getenv("PROFILE_IMPORTS") == "1" else None
+
+from grocery_god import metrics
+from grocery_god.pipelines.change_detection import (
+    HASH_METADATA_KEY,
+    content_hash,
+    s3_content_hash,
+)
 
 BUCKET = os.getenv("OUTPUT_BUCKET")
 PREFIX = os.getenv("OUTPUT_PREFIX")
+COMPRESS = os.getenv("OUTPUT_GZIP") == "1"
+
+# The Lambda runtime's root logger is at WARNING; span lines are logged at INFO
+if metrics.ENABLED:
+    metrics.configure_logging()
+
+if os.getenv("PREWARM_IMPORTS") == "1":
+    logging.info("Prewarmed imports: %s", prewarm())
+
+
+@lru_cache(maxsize=None)
+def get_s3():
+    import boto3
+
+    return boto3.client("s3")
+
 
 def handler(event, context):
-    final_path = run_safeway_pipeline(output_path="/tmp")
+    from grocery_god.pipelines.safeway import scrape_weekly_ad
+    from grocery_god.pipelines.s3_export import scrape_to_s3
+
+    # Warm invocations start a fresh set of spans
+    metrics.reset()
+
+    all_products, valid_from, valid_until = scrape_weekly_ad()
+
+    with metrics.span("s3_client"):
+        s3 = get_s3()
+
+    key = f"{PREFIX}weeklyad_{valid_from}.csv" + (".gz" if COMPRESS else "")
+    with metrics.span("change_detection", labels=len(all_products)):
+        digest = content_hash(all_products, valid_from, valid_until)
+        stored_digest = s3_content_hash(s3, BUCKET, key)
 
-    filename = pathlib.Path(final_path).name
+    if stored_digest == digest:
+        logging.info("Weekly ad unchanged since last upload of %s, skipping.", key)
+        result = {"bucket": BUCKET, "key": key, "bytes": 0, "unchanged": True, "content_hash": digest}
+    else:
+        upload = scrape_to_s3(
+            s3, all_products, valid_from, valid_until, BUCKET, key,
+            compress=COMPRESS, metadata={HASH_METADATA_KEY: digest},
+        )
+        result = {"bucket": BUCKET, "key": key, "bytes": upload["bytes"], "unchanged": False, "content_hash": digest}
 
-    key = f"{PREFIX}{filename}"
+    if metrics.ENABLED:
+        metrics.log_summary()
+        result["metrics"] = metrics.summary()
 
-    s3.upload_file(final_path, BUCKET, key)
+    if profiler is not None:
+        profiler.log()
+        result["imports"] = profiler.report()
 
-    return {"bucket": BUCKET, "key": key, "tmp_path": str(final_path)}
+    return result
@@ -0,0 +1,125 @@
+"""
+Startup helpers for the Lambda container image: deferred heavy imports and import profiling.
+
+Cold starts pay for every module imported at init. The handler defers boto3 and Playwright
+until they are first used, and never imports the parsing and cleaning stack (pandas).
+This module lets the handler choose when those imports happen, and measures what they cost.
+
+Set PREWARM_IMPORTS=1 to import the heavy modules at init instead. That suits provisioned
+concurrency, where init runs ahead of the first request. Set PROFILE_IMPORTS=1 to record
+the time spent importing each module; the handler then logs a per-module breakdown and
+returns it in its response.
+
+Classes:
+    ImportProfiler: Meta-path hook that times each module's import, cumulative and self.
+
+Functions:
+    prewarm(modules: tuple[str, ...] = HEAVY_MODULES) -> dict[str, float]:
+        Imports the given modules now and returns seconds spent per module.
+"""
+
+import importlib
+import logging
+import sys
+import time
+
+# Imported lazily by the Lambda handler path, in the order the handler first needs them
+HEAVY_MODULES = ("playwright.sync_api", "boto3")
+
+
+class ImportProfiler:
+    """
+    Times module imports made while it is installed.
+
+    Cumulative time includes the module's own imports; self time excludes them. Modules
+    that were already imported before install() cost nothing and are not recorded.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self._stack = []
+
+    def install(self) -> "ImportProfiler":
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+        return self
+
+    def uninstall(self) -> None:
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+
+        # Builtin and frozen importers are shared classes; only wrap per-module loader instances
+        loader = spec.loader
+        if loader is not None and not isinstance(loader, type) and hasattr(loader, "exec_module"):
+            try:
+                loader.exec_module = self._timed(fullname, loader)
+            except AttributeError:
+                pass
+
+        return spec
+
+    def _timed(self, fullname: str, loader):
+        exec_module = loader.exec_module
+
+        def timed_exec_module(module):
+            frame = [time.perf_counter(), 0.0]
+            self._stack.append(frame)
+            try:
+                exec_module(module)
+            finally:
+                self._stack.pop()
+                vars(loader).pop("exec_module", None)
+                cumulative = time.perf_counter() - frame[0]
+                self.timings[fullname] = (cumulative, cumulative - frame[1])
+                if self._stack:
+                    self._stack[-1][1] += cumulative
+
+        return timed_exec_module
+
+    def total(self) -> float:
+        """Seconds spent in top-level imports, i.e. without double-counting nested ones."""
+
+        return sum(self_time for _, self_time in self.timings.values())
+
+    def report(self, top: int = 15) -> dict:
+        """Summary of the slowest imports, sorted by cumulative time."""
+
+        slowest = sorted(self.timings.items(), key=lambda item: item[1][0], reverse=True)[:top]
+        return {
+            "modules_imported": len(self.timings),
+            "total_seconds": round(self.total(), 4),
+            "slowest": [
+                {"module": name, "cumulative_s": round(cumulative, 4), "self_s": round(self_time, 4)}
+                for name, (cumulative, self_time) in slowest
+            ],
+        }
+
+    def log(self, top: int = 15) -> None:
+        report = self.report(top)
+        logging.info(
+            "Imported %s modules in %.3fs", report["modules_imported"], report["total_seconds"]
+        )
+        for row in report["slowest"]:
+            logging.info(
+                "  %-40s %8.4fs cumulative %8.4fs self",
+                row["module"], row["cumulative_s"], row["self_s"],
+            )
+
+
+def prewarm(modules: tuple[str, ...] = HEAVY_MODULES) -> dict[str, float]:
+    seconds = {}
+    for name in modules:
+        start = time.perf_counter()
+        importlib.import_module(name)
+        seconds[name] = round(time.perf_counter() - start, 4)
+    return seconds
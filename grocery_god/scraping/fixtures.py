@@ -0,0 +1,133 @@
+"""
+Record and replay of weekly-ad sessions, so the scraper can run without the live site.
+
+Record mode loads the live page as usual and saves every response the browser
+context receives (the page, both iframe documents, their scripts and XHR) to a HAR
+file with the bodies embedded. Replay mode serves that HAR through Playwright
+routing and aborts every request it does not contain, so nothing reaches the
+network. Extraction, browser reuse, request blocking and scrape timings can then be
+run and compared on any machine, offline.
+
+A fixture is a directory holding session.har and meta.json (the URL that was
+recorded and when). The HAR is written when the recording context closes.
+
+Classes:
+    SessionFixture: A fixture directory and the mode it is used in ("record" or "replay").
+
+Functions:
+    fixture_from_env() -> SessionFixture | None: The fixture named by SCRAPER_FIXTURE and SCRAPER_FIXTURE_MODE.
+
+Usage:
+    python -m grocery_god.scraping.fixtures record data/fixtures/weeklyad
+    python -m grocery_god.scraping.fixtures replay data/fixtures/weeklyad --repeat 5
+    python -m grocery_god.scraping.fixtures replay data/fixtures/weeklyad --stream
+    SCRAPER_FIXTURE=data/fixtures/weeklyad SCRAPER_FIXTURE_MODE=replay python -m grocery_god.pipelines.safeway
+
+Note:
+    Replay matches requests on method and URL (and POST body). Requests whose URL
+    changes per visit, such as cache-busting query strings, miss the HAR and are
+    aborted; re-record the fixture when the site changes.
+    The request blocker runs before the HAR route, so blocked requests stay blocked
+    in replay and are never recorded.
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import NamedTuple
+
+from playwright.sync_api import BrowserContext
+
+HAR_NAME = "session.har"
+META_NAME = "meta.json"
+MODES = ("record", "replay")
+
+
+class SessionFixture(NamedTuple):
+    path: str
+    mode: str = "replay"
+
+    @property
+    def har_path(self) -> Path:
+        return Path(self.path) / HAR_NAME
+
+    def url(self, default: str) -> str:
+        """The URL the fixture was recorded from, in replay; `default` otherwise."""
+
+        meta_path = Path(self.path) / META_NAME
+        if self.mode != "replay" or not meta_path.exists():
+            return default
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f)["url"]
+
+    def attach(self, context: BrowserContext, url: str) -> None:
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown fixture mode {self.mode!r}; expected one of {MODES}.")
+
+        if self.mode == "replay":
+            if not self.har_path.exists():
+                raise FileNotFoundError(f"No recorded session at {self.har_path}.")
+            context.route_from_har(self.har_path, not_found="abort")
+            return
+
+        self.har_path.parent.mkdir(parents=True, exist_ok=True)
+        context.route_from_har(
+            self.har_path, update=True, update_content="embed", update_mode="minimal"
+        )
+        with open(Path(self.path) / META_NAME, "w", encoding="utf-8") as f:
+            json.dump(
+                {"url": url, "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds")},
+                f,
+                indent=2,
+            )
+            f.write("\n")
+
+
+def fixture_from_env() -> SessionFixture | None:
+    path = os.getenv("SCRAPER_FIXTURE")
+    if not path:
+        return None
+    return SessionFixture(path, os.getenv("SCRAPER_FIXTURE_MODE", "replay"))
+
+
+def main() -> None:
+    from grocery_god import metrics
+    from grocery_god.scraping.safeway import WEEKLY_AD_URL, scrape_safeway
+    from grocery_god.scraping.streaming import LabelStream
+
+    parser = argparse.ArgumentParser(description="Record or replay a weekly-ad scraping session.")
+    parser.add_argument("mode", choices=MODES)
+    parser.add_argument("path", help="fixture directory")
+    parser.add_argument("--url", default=WEEKLY_AD_URL, help="page to record")
+    parser.add_argument("--repeat", type=int, default=1, help="replays to run, reusing the browser")
+    parser.add_argument("--no-block", action="store_true", help="load everything, blocking nothing")
+    parser.add_argument("--stream", action="store_true", help="stream labels until they settle")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    fixture = SessionFixture(args.path, args.mode)
+    runs = 1 if args.mode == "record" else args.repeat
+
+    for run in range(1, runs + 1):
+        metrics.reset()
+        start = time.perf_counter()
+        products, valid_from, valid_until = scrape_safeway(
+            url=args.url,
+            block_requests=not args.no_block,
+            fixture=fixture,
+            stream=LabelStream() if args.stream else None,
+        )
+        print(
+            f"run {run}: {len(products)} labels, {valid_from} - {valid_until}, "
+            f"{time.perf_counter() - start:.2f}s"
+        )
+        if metrics.ENABLED:
+            print(json.dumps(metrics.summary()["stages"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Request routing for the weekly-ad scrapers.
+
+The scrapers only read aria-labels and a date string, so images, fonts, media
+and third-party trackers are dead weight: they slow page loads and cost memory
+and bandwidth in the Lambda's single-process Chromium. RequestBlocker installs a
+route on a browser context that aborts (or stubs) those requests and counts what
+it blocked. Allowed requests fall back to any route registered before the
+blocker (e.g. a replayed session), or to the network.
+
+Classes:
+    RequestBlocker: Allow/deny-list route interceptor with request and byte counters.
+
+Usage:
+    blocker = RequestBlocker()
+    blocker.attach(context)
+    ...
+    logging.info("Request stats: %s", blocker.stats())
+
+Note:
+    Aborted requests are never downloaded, so their size is unknown. Bytes saved
+    is measured by comparing bytes_loaded against a run with an empty blocker
+    (RequestBlocker(blocked_resource_types=(), blocked_domains=())), which only
+    counts.
+"""
+
+import logging
+from collections import Counter
+from urllib.parse import urlparse
+
+from playwright.sync_api import BrowserContext, Error as PlaywrightError, Request, Route
+
+DEFAULT_BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+
+DEFAULT_BLOCKED_DOMAINS = frozenset(
+    {
+        "google-analytics.com",
+        "googletagmanager.com",
+        "doubleclick.net",
+        "googlesyndication.com",
+        "facebook.net",
+        "facebook.com",
+        "adobedtm.com",
+        "omtrdc.net",
+        "demdex.net",
+        "everesttech.net",
+        "hotjar.com",
+        "newrelic.com",
+        "nr-data.net",
+        "criteo.com",
+        "bing.com",
+        "pinterest.com",
+        "tiktok.com",
+        "quantummetric.com",
+    }
+)
+
+
+def _matches(host: str, domains) -> bool:
+    return any(host == domain or host.endswith(f".{domain}") for domain in domains)
+
+
+class RequestBlocker:
+
+    def __init__(
+        self,
+        blocked_resource_types=DEFAULT_BLOCKED_RESOURCE_TYPES,
+        blocked_domains=DEFAULT_BLOCKED_DOMAINS,
+        allowed_domains=(),
+        stub: bool = False,
+    ):
+        self.blocked_resource_types = frozenset(blocked_resource_types)
+        self.blocked_domains = frozenset(blocked_domains)
+        self.allowed_domains = frozenset(allowed_domains)
+        self.stub = stub
+
+        self.blocked = Counter()
+        self.allowed = 0
+        self.bytes_loaded = 0
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        host = urlparse(url).hostname or ""
+
+        if _matches(host, self.allowed_domains):
+            return False
+
+        return resource_type in self.blocked_resource_types or _matches(
+            host, self.blocked_domains
+        )
+
+    def attach(self, context: BrowserContext) -> None:
+        context.route("**/*", self._handle)
+        context.on("requestfinished", self._on_finished)
+
+    async def attach_async(self, context) -> None:
+        """Same as attach, for a playwright.async_api BrowserContext."""
+
+        await context.route("**/*", self._handle_async)
+        context.on("requestfinished", self._on_finished_async)
+
+    def _count(self, request) -> bool:
+        if not self.should_block(request.url, request.resource_type):
+            self.allowed += 1
+            return False
+
+        self.blocked[request.resource_type] += 1
+        return True
+
+    def _add_sizes(self, sizes: dict) -> None:
+        self.bytes_loaded += sizes["responseBodySize"] + sizes["responseHeadersSize"]
+
+    def _handle(self, route: Route) -> None:
+        if not self._count(route.request):
+            route.fallback()
+        elif self.stub:
+            route.fulfill(status=204, body=b"")
+        else:
+            route.abort("blockedbyclient")
+
+    async def _handle_async(self, route) -> None:
+        if not self._count(route.request):
+            await route.fallback()
+        elif self.stub:
+            await route.fulfill(status=204, body=b"")
+        else:
+            await route.abort("blockedbyclient")
+
+    def _on_finished(self, request: Request) -> None:
+        try:
+            self._add_sizes(request.sizes())
+        except PlaywrightError as e:
+            logging.debug("No sizes for %s: %s", request.url, e)
+
+    async def _on_finished_async(self, request) -> None:
+        try:
+            self._add_sizes(await request.sizes())
+        except PlaywrightError as e:
+            logging.debug("No sizes for %s: %s", request.url, e)
+
+    def stats(self) -> dict:
+        return {
+            "requests_allowed": self.allowed,
+            "requests_blocked": sum(self.blocked.values()),
+            "blocked_by_type": dict(self.blocked),
+            "bytes_loaded": self.bytes_loaded,
+        }
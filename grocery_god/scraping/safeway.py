@@ -1,21 +1,57 @@
+import atexit
 import csv
 import os
 import re
 import logging
+import random
 import time
+from collections import Counter
 from datetime import datetime
-from typing import Tuple, List, Optional
+from typing import NamedTuple, Tuple, List, Optional
 from datetime import datetime
 from pathlib import Path
 
 from playwright.sync_api import (
+    Browser,
+    BrowserContext,
+    Error as PlaywrightError,
     Page,
+    Playwright,
     sync_playwright,
     TimeoutError as PlaywrightTimeoutError,
 )
 
+from grocery_god.metrics import span
+from grocery_god.scraping.fixtures import SessionFixture
+from grocery_god.scraping.routing import RequestBlocker
+from grocery_god.scraping.streaming import LabelStream
+
 DATE_RX = re.compile(r"([a-zA-Z]+ \d+[a-zA-Z]+) - ([a-zA-Z]+ \d+[a-zA-Z]+)")
 
+WEEKLY_AD_URL = "https://www.safeway.com/weeklyad/"
+PRODUCT_SELECTOR = "sfml-flyer-image-a[aria-label]"
+LABELS_JS = "nodes => nodes.map(n => n.getAttribute('aria-label')).filter(Boolean)"
+
+NAV_IFRAME = 'iframe[title="Navigation Bar"]'
+MAIN_IFRAME = 'iframe[title="Main Panel"]'
+
+# One deadline for reading both iframes, after the page has loaded
+EXTRACT_TIMEOUT_MS = 30_000
+GOTO_TIMEOUT_MS = 30_000
+
+BROWSER_ARGS = [
+    "--no-sandbox",
+    "--disable-setuid-sandbox",
+    "--disable-dev-shm-usage",
+    "--single-process",
+    "--disable-gpu",
+    "--disable-software-rasterizer",
+]
+
+# Kept alive across retries and warm Lambda invocations; see _get_browser
+_playwright: Optional[Playwright] = None
+_browser: Optional[Browser] = None
+
 
 def _parse_dates(date_text: str) -> Tuple[Optional[str], Optional[str]]:
     """
@@ -39,97 +75,311 @@ def _parse_dates(date_text: str) -> Tuple[Optional[str], Optional[str]]:
     return valid_from, valid_until
 
 
-def _extract_dates_from_nav_iframe(
-    page: Page, timeout_ms: int = 30_000
-) -> Tuple[Optional[str], Optional[str]]:
+def _extract_weekly_ad(
+    page: Page,
+    timeout_ms: int = EXTRACT_TIMEOUT_MS,
+    poll_ms: int = 100,
+    found: Optional[dict] = None,
+    stream: Optional[LabelStream] = None,
+) -> Tuple[List[str], Optional[str], Optional[str]]:
+    """
+    Read the products from the Main Panel iframe and the date range from the Navigation
+    Bar iframe under one deadline. Neither frame waits on the other: products are read
+    as soon as they are attached, whether or not the dates have shown up yet.
 
-    iframe_locator = page.locator('iframe[title="Navigation Bar"]')
-    iframe_locator.wait_for(state="attached", timeout=timeout_ms)
+    Each part is stored in `found` ("products", "dates") as soon as it is read, and parts
+    already there are not read again, so a retry only waits for what is still missing.
 
-    handle = iframe_locator.element_handle()
-    frame = handle.content_frame()
-    if frame is None:
-        raise PlaywrightTimeoutError("Navigation Bar iframe has no content frame yet.")
+    With a LabelStream (attached to the page), products are streamed from the first
+    tile on and count as read once the stream has settled, instead of being taken
+    in one snapshot when the first tile attaches.
+    """
 
-    locator = frame.get_by_text(DATE_RX).first
-    locator.wait_for(state="attached", timeout=timeout_ms)
+    found = {} if found is None else found
 
-    date_text = locator.text_content() or ""
-    valid_from, valid_until = _parse_dates(date_text)
-    return valid_from, valid_until
+    # The sync API runs one call at a time, so both frames are polled in turn rather
+    # than awaited together; each check returns at once instead of blocking on a timeout
+    start = time.monotonic()
+    deadline = start + timeout_ms / 1000
+    nav = page.frame_locator(NAV_IFRAME)
+    main = page.frame_locator(MAIN_IFRAME)
+    date_locator = nav.get_by_text(DATE_RX).first
+    items = main.locator(PRODUCT_SELECTOR)
 
+    with span("extract") as s:
+        while True:
+            if "products" not in found and items.count():
+                if stream is None:
+                    found["products"] = items.evaluate_all(LABELS_JS)
+                else:
+                    stream.observe(main, PRODUCT_SELECTOR)
+                    if stream.settled():
+                        stream.stop(main)
+                        found["products"] = list(stream.labels)
+                        s.count(batches=stream.batches)
+                if "products" in found:
+                    s.count(labels=len(found["products"]), products_s=round(time.monotonic() - start, 4))
+            if "dates" not in found and date_locator.count():
+                found["dates"] = _parse_dates(date_locator.text_content() or "")
+                s.count(dates_s=round(time.monotonic() - start, 4))
 
-def _extract_products_from_main_iframe(
-    page: Page, timeout_ms: int = 30_000
-) -> List[str]:
+            if "products" in found and "dates" in found:
+                return found["products"], *found["dates"]
 
-    iframe = page.locator('iframe[title="Main Panel"]')
-    iframe.wait_for(state="attached", timeout=timeout_ms)
-    frame = iframe.element_handle().content_frame()
-    if frame is None:
-        raise PlaywrightTimeoutError("Main Panel iframe not ready")
+            if time.monotonic() >= deadline:
+                missing = [name for name in ("products", "dates") if name not in found]
+                raise PlaywrightTimeoutError(
+                    f"Weekly ad {' and '.join(missing)} not attached within {timeout_ms} ms."
+                )
+            page.wait_for_timeout(poll_ms)
 
-    items = frame.locator("sfml-flyer-image-a[aria-label]")
-    items.first.wait_for(state="attached", timeout=timeout_ms)
 
-    labels = items.evaluate_all(
-        "nodes => nodes.map(n => n.getAttribute('aria-label')).filter(Boolean)"
-    )
-    return labels
+def _get_browser() -> Browser:
+    """Return the module's browser, launching it only if missing or crashed."""
+
+    global _playwright, _browser
+
+    if _browser is not None and _browser.is_connected():
+        return _browser
+
+    close_browser()
+
+    start = time.perf_counter()
+    with span("browser_launch"):
+        _playwright = sync_playwright().start()
+        _browser = _playwright.chromium.launch(headless=True, args=BROWSER_ARGS)
+    logging.info("Launched browser in %.2fs", time.perf_counter() - start)
+
+    return _browser
+
+
+def close_browser() -> None:
+    global _playwright, _browser
+
+    if _browser is not None:
+        try:
+            _browser.close()
+        except PlaywrightError as e:
+            logging.warning("Browser did not close cleanly: %s", e)
+    if _playwright is not None:
+        try:
+            _playwright.stop()
+        except PlaywrightError as e:
+            logging.warning("Playwright did not stop cleanly: %s", e)
 
+    _playwright, _browser = None, None
 
-def _launch_browser():
-    p = sync_playwright().start()
-    browser = p.chromium.launch(
-        headless=True,
-        args=[
-            "--no-sandbox",
-            "--disable-setuid-sandbox",
-            "--disable-dev-shm-usage",
-            "--single-process",
-            "--disable-gpu",
-            "--disable-software-rasterizer",
-        ],
-    )
-    context = browser.new_context()
-    return p, browser, context
 
+atexit.register(close_browser)
 
-def _scrape() -> Tuple[List[str], Optional[str], Optional[str]]:
 
-    p, browser, context = _launch_browser()
+def _new_context(
+    blocker: Optional[RequestBlocker] = None,
+    fixture: Optional[SessionFixture] = None,
+    url: str = WEEKLY_AD_URL,
+) -> BrowserContext:
+    # Service workers would bypass context routing
+    options = {"service_workers": "block"} if blocker or fixture else {}
 
     try:
-        page = context.new_page()
-        page.set_default_timeout(30_000)
-        page.goto("https://www.safeway.com/weeklyad/", wait_until="domcontentloaded")
+        context = _get_browser().new_context(**options)
+    except PlaywrightError as e:
+        # Connected but unresponsive browser: drop it, and let the retried open step launch a new one
+        logging.warning("Browser failed health check, closing it: %s", e)
+        close_browser()
+        raise
+
+    # Routes run last-registered first: the blocker decides, then the fixture serves or records
+    if fixture:
+        fixture.attach(context, url)
+    if blocker:
+        blocker.attach(context)
+    return context
+
+
+class RetryPolicy(NamedTuple):
+    """
+    Step retries for scrape_safeway. Only the failed step is retried, but `attempts` caps
+    the failures of the whole scrape, as it capped whole-scrape attempts before. Each
+    retry waits a delay drawn uniformly from [0, min(max_delay, base_delay * 2 ** (failure - 1))]
+    ("full jitter"), and no retry starts once `budget_s` seconds of the scrape have passed.
+    """
+
+    attempts: int = 3
+    base_delay: float = 5.0
+    max_delay: float = 15.0
+    budget_s: float = 180.0
+
+    def delay(self, failure: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (failure - 1)))
+
+
+class _Session:
+    """The scrape's context and page, and what has been read from them so far."""
+
+    def __init__(
+        self,
+        blocker: Optional[RequestBlocker],
+        url: str,
+        fixture: Optional[SessionFixture] = None,
+        stream: Optional[LabelStream] = None,
+    ):
+        self.blocker = blocker
+        self.fixture = fixture
+        self.stream = stream
+        self.url = fixture.url(url) if fixture else url
+        self.context: Optional[BrowserContext] = None
+        self.page: Optional[Page] = None
+        self.loaded = False
+        self.found = {}
+
+    def open(self) -> None:
+        self.close()
+        self.context = _new_context(self.blocker, self.fixture, self.url)
+        self.page = self.context.new_page()
+        self.page.set_default_timeout(30_000)
+        if self.stream:
+            self.stream.attach(self.page)
+
+    def load(self, timeout_ms: int) -> None:
+        with span("goto"):
+            self.page.goto(self.url, wait_until="domcontentloaded", timeout=timeout_ms)
+        self.loaded = True
+
+    def needs_reload(self) -> bool:
+        """True when the iframe of a part still missing is not on the page at all."""
+
+        frames = {"dates": NAV_IFRAME, "products": MAIN_IFRAME}
+        try:
+            return any(
+                not self.page.locator(frame).count()
+                for part, frame in frames.items()
+                if part not in self.found
+            )
+        except PlaywrightError:
+            return True
+
+    def close(self) -> None:
+        if self.context is not None:
+            try:
+                self.context.close()
+            except PlaywrightError as e:
+                logging.warning("Browser context did not close cleanly: %s", e)
+        self.context, self.page, self.loaded = None, None, False
+
+
+def _scrape(
+    blocker: Optional[RequestBlocker] = None,
+    url: str = WEEKLY_AD_URL,
+    policy: Optional[RetryPolicy] = None,
+    fixture: Optional[SessionFixture] = None,
+    stream: Optional[LabelStream] = None,
+) -> Tuple[List[str], Optional[str], Optional[str]]:
+    """
+    Open, load and extract as separate steps, retrying only the step that failed.
+
+    Timeouts retry on the same page: a failed load is loaded again, a failed extraction
+    keeps the parts already read and waits for the rest, reloading only when a missing
+    part's iframe is not on the page. Any other browser error (a crashed page or
+    context) starts over with a new context, still keeping the parts already read.
+    """
 
-        valid_from, valid_until = _extract_dates_from_nav_iframe(page)
-        products = _extract_products_from_main_iframe(page)
-        return products, valid_from, valid_until
-    finally:
-        context.close()
-        browser.close()
-        p.stop()
+    policy = policy or RetryPolicy()
+    budget_end = time.monotonic() + policy.budget_s
+    session = _Session(blocker, url, fixture, stream)
+    if stream:
+        stream.reset()
+    failures = Counter()
+
+    with span("scrape") as s:
+        try:
+            while True:
+                step = "open" if session.page is None else "load" if not session.loaded else "extract"
+                remaining_ms = max(1, int((budget_end - time.monotonic()) * 1000))
+                try:
+                    if step == "open":
+                        session.open()
+                    elif step == "load":
+                        session.load(min(GOTO_TIMEOUT_MS, remaining_ms))
+                    else:
+                        return _extract_weekly_ad(
+                            session.page,
+                            min(EXTRACT_TIMEOUT_MS, remaining_ms),
+                            found=session.found,
+                            stream=stream,
+                        )
+                    continue
+                except ValueError as e:
+                    # Unparseable date text: read it again from a reloaded page
+                    session.loaded = False
+                    error = e
+                except PlaywrightTimeoutError as e:
+                    if step == "extract" and session.needs_reload():
+                        session.loaded = False
+                    error = e
+                except PlaywrightError as e:
+                    session.close()
+                    error = e
+
+                failures[step] += 1
+                failed = sum(failures.values())
+                delay = policy.delay(failed)
+                logging.error(
+                    "Step %s failed (%s/%s, have %s): %s",
+                    step, failed, policy.attempts, sorted(session.found) or "nothing", error,
+                )
+                if failed >= policy.attempts:
+                    raise error
+                if time.monotonic() + delay >= budget_end:
+                    raise PlaywrightTimeoutError(
+                        f"Scrape budget of {policy.budget_s}s spent; last error: {error}"
+                    ) from error
+                time.sleep(delay)
+        finally:
+            session.close()
+            s.count(retries=sum(failures.values()))
+            if blocker:
+                logging.info("Request stats: %s", blocker.stats())
 
 
 def scrape_safeway(
-    retries: int = 3, backoff: int = 5
+    retries: int = 3,
+    backoff: float = 5,
+    block_requests: bool = True,
+    blocker: Optional[RequestBlocker] = None,
+    url: str = WEEKLY_AD_URL,
+    policy: Optional[RetryPolicy] = None,
+    fixture: Optional[SessionFixture] = None,
+    stream: Optional[LabelStream] = None,
 ) -> Tuple[List[str], Optional[str], Optional[str]]:
-    for attempt in range(1, retries + 1):
-        try:
-            return _scrape()
-        except (PlaywrightTimeoutError, ValueError) as e:
-            logging.error("Attempt %s/%s failed: %s", attempt, retries, e)
-            if attempt < retries:
-                time.sleep(backoff)
-            else:
-                logging.error("All retries exhausted.")
-                break
+    """
+    Pass a configured RequestBlocker to change what is blocked, or block_requests=False to load everything.
+    retries caps the attempts of the whole scrape and backoff is the first retry's longest delay, as before;
+    retries now resume the failed step instead of starting over. Pass a RetryPolicy for full control.
+    Pass a SessionFixture to record the session, or to replay a recorded one without network access.
+    Pass a LabelStream to stream labels as the flyer renders, until they settle, instead of one snapshot.
+    """
+
+    blocker = (blocker or RequestBlocker()) if block_requests else None
+    policy = policy or RetryPolicy(attempts=retries, base_delay=backoff)
+
+    try:
+        return _scrape(blocker, url=url, policy=policy, fixture=fixture, stream=stream)
+    except (PlaywrightError, ValueError) as e:
+        logging.error("All retries exhausted: %s", e)
 
     return [], None, None
 
 
+def write_csv_rows(f, all_products: List[str], valid_from: str, valid_until: str) -> None:
+    """Write the raw scrape format to an open text stream: the date range, then one label per row."""
+
+    w = csv.writer(f)
+    w.writerow([f"{valid_from} - {valid_until}"])
+    for product in all_products:
+        w.writerow([product])
+
+
 def scrape_to_csv(
     all_products: List[str],
     valid_from: str,
@@ -146,10 +396,7 @@ def scrape_to_csv(
 
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    with open(output_path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow([f"{valid_from} - {valid_until}"])
-        for product in all_products:
-            w.writerow([product])
+    with span("export_csv", rows=len(all_products)), open(output_path, "w", newline="", encoding="utf-8") as f:
+        write_csv_rows(f, all_products, valid_from, valid_until)
 
     return str(output_path)
@@ -0,0 +1,200 @@
+"""
+Asyncio scraping engine for many Safeway weekly-ad targets at once.
+
+One browser is launched per run and every target gets its own context and page,
+with a semaphore bounding how many pages are open at the same time. Each target
+has its own timeout and retries, and a failing target never aborts the others.
+Within a page, the date range and the products are read from their iframes
+concurrently, under one deadline.
+
+Classes:
+    ScrapeTarget: A named weekly-ad page to scrape (e.g. one store or zip code).
+
+Functions:
+    scrape_targets_async(targets, concurrency=4, ...) -> dict:
+        Scrapes all targets concurrently; each result has the same shape as scrape_safeway's.
+    scrape_safeway_targets(targets, **kwargs) -> dict:
+        Synchronous wrapper around scrape_targets_async.
+
+Usage:
+    targets = [ScrapeTarget("store-1234", url_for_store_1234), ScrapeTarget("default")]
+    results = scrape_safeway_targets(targets, concurrency=4, timeout_s=90)
+    products, valid_from, valid_until = results["store-1234"]
+
+Note:
+    Target names must be unique; they key the results. The URL decides which store's
+    ad is loaded, so pass the store- or location-specific weekly-ad URL per target.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from playwright.async_api import (
+    Browser,
+    Error as PlaywrightError,
+    Page,
+    async_playwright,
+    TimeoutError as PlaywrightTimeoutError,
+)
+
+from grocery_god.metrics import span
+from grocery_god.scraping.routing import RequestBlocker
+from grocery_god.scraping.safeway import (
+    BROWSER_ARGS,
+    DATE_RX,
+    EXTRACT_TIMEOUT_MS,
+    LABELS_JS,
+    MAIN_IFRAME,
+    NAV_IFRAME,
+    PRODUCT_SELECTOR,
+    WEEKLY_AD_URL,
+    _parse_dates,
+)
+
+ScrapeResult = Tuple[List[str], Optional[str], Optional[str]]
+
+
+class ScrapeTarget(NamedTuple):
+    name: str
+    url: str = WEEKLY_AD_URL
+
+
+async def _extract_dates_from_nav_iframe(
+    page: Page, timeout_ms: int = EXTRACT_TIMEOUT_MS
+) -> Tuple[Optional[str], Optional[str]]:
+
+    iframe_locator = page.locator(NAV_IFRAME)
+    await iframe_locator.wait_for(state="attached", timeout=timeout_ms)
+
+    handle = await iframe_locator.element_handle()
+    frame = await handle.content_frame()
+    if frame is None:
+        raise PlaywrightTimeoutError("Navigation Bar iframe has no content frame yet.")
+
+    locator = frame.get_by_text(DATE_RX).first
+    await locator.wait_for(state="attached", timeout=timeout_ms)
+
+    date_text = await locator.text_content() or ""
+    return _parse_dates(date_text)
+
+
+async def _extract_products_from_main_iframe(
+    page: Page, timeout_ms: int = EXTRACT_TIMEOUT_MS
+) -> List[str]:
+
+    iframe = page.locator(MAIN_IFRAME)
+    await iframe.wait_for(state="attached", timeout=timeout_ms)
+    frame = await (await iframe.element_handle()).content_frame()
+    if frame is None:
+        raise PlaywrightTimeoutError("Main Panel iframe not ready")
+
+    items = frame.locator(PRODUCT_SELECTOR)
+    await items.first.wait_for(state="attached", timeout=timeout_ms)
+
+    return await items.evaluate_all(LABELS_JS)
+
+
+async def _extract_weekly_ad(
+    page: Page, target: ScrapeTarget, timeout_ms: int = EXTRACT_TIMEOUT_MS
+) -> ScrapeResult:
+    """Read both iframes concurrently under one deadline; products never wait on the dates."""
+
+    async def products() -> List[str]:
+        with span("extract_products", target=target.name) as s:
+            labels = await _extract_products_from_main_iframe(page, timeout_ms)
+            s.count(labels=len(labels))
+            return labels
+
+    async def dates() -> Tuple[Optional[str], Optional[str]]:
+        with span("extract_dates", target=target.name):
+            return await _extract_dates_from_nav_iframe(page, timeout_ms)
+
+    tasks = [asyncio.ensure_future(products()), asyncio.ensure_future(dates())]
+    try:
+        labels, (valid_from, valid_until) = await asyncio.wait_for(
+            asyncio.gather(*tasks), timeout=timeout_ms / 1000
+        )
+    finally:
+        # A failed read makes the other one pointless
+        for task in tasks:
+            task.cancel()
+
+    return labels, valid_from, valid_until
+
+
+async def _scrape_target(
+    browser: Browser, target: ScrapeTarget, blocker: Optional[RequestBlocker]
+) -> ScrapeResult:
+
+    options = {"service_workers": "block"} if blocker else {}
+    context = await browser.new_context(**options)
+    if blocker:
+        await blocker.attach_async(context)
+
+    try:
+        page = await context.new_page()
+        page.set_default_timeout(30_000)
+        with span("goto", target=target.name):
+            await page.goto(target.url, wait_until="domcontentloaded")
+
+        return await _extract_weekly_ad(page, target)
+    finally:
+        await context.close()
+        if blocker:
+            logging.info("[%s] Request stats: %s", target.name, blocker.stats())
+
+
+async def scrape_targets_async(
+    targets: List[ScrapeTarget],
+    concurrency: int = 4,
+    timeout_s: float = 120,
+    retries: int = 3,
+    backoff: int = 5,
+    block_requests: bool = True,
+    browser_args: List[str] = BROWSER_ARGS,
+) -> Dict[str, ScrapeResult]:
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, args=browser_args)
+
+        async def run(target: ScrapeTarget) -> Tuple[str, ScrapeResult]:
+            blocker = RequestBlocker() if block_requests else None
+
+            for attempt in range(1, retries + 1):
+                start = time.perf_counter()
+                try:
+                    async with semaphore:
+                        result = await asyncio.wait_for(
+                            _scrape_target(browser, target, blocker), timeout=timeout_s
+                        )
+                    logging.info(
+                        "[%s] Scraped %s labels in %.2fs",
+                        target.name, len(result[0]), time.perf_counter() - start,
+                    )
+                    return target.name, result
+                except (PlaywrightError, ValueError, asyncio.TimeoutError) as e:
+                    logging.error(
+                        "[%s] Attempt %s/%s failed: %r", target.name, attempt, retries, e
+                    )
+
+                # Back off without holding a page slot
+                if attempt < retries:
+                    await asyncio.sleep(backoff)
+
+            logging.error("[%s] All retries exhausted.", target.name)
+            return target.name, ([], None, None)
+
+        try:
+            results = await asyncio.gather(*(run(target) for target in targets))
+        finally:
+            await browser.close()
+
+    return dict(results)
+
+
+def scrape_safeway_targets(targets: List[ScrapeTarget], **kwargs) -> Dict[str, ScrapeResult]:
+    return asyncio.run(scrape_targets_async(targets, **kwargs))
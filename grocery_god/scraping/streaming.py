@@ -0,0 +1,158 @@
+"""
+Streaming extraction of weekly-ad labels as the flyer renders.
+
+The flyer renders its tiles lazily, so one snapshot of the Main Panel taken after the
+first tile attaches can miss tiles that render later. LabelStream instead installs a
+MutationObserver in the panel that sends each new aria-label to Python through an
+exposed binding, scrolls the panel to make lazy tiles render, and counts the flyer as
+complete once no new label has arrived for `stable_ms`.
+
+Labels are deduplicated as they arrive, in the browser and again in Python, so a
+tile that re-renders (or a repeated label) is kept once, in first-seen order. A
+snapshot keeps repeated labels; a stream does not.
+
+Classes:
+    LabelStream: Receives, deduplicates and forwards streamed labels, and tells when they settle.
+
+Usage:
+    stream = LabelStream(on_labels=lambda batch: queue.put(batch), stable_ms=2_000)
+    products, valid_from, valid_until = scrape_safeway(stream=stream)
+
+    A stream can be reused: each scrape starts it afresh, and a retry on the same page
+    continues where it stopped.
+
+Note:
+    on_labels runs on the scraping thread, inside Playwright calls, so it should be
+    quick: hand the batch to a queue or another thread rather than parse it in place.
+"""
+
+import logging
+import time
+from typing import Callable, List, Optional
+
+from playwright.sync_api import Error as PlaywrightError, FrameLocator, Page
+
+BINDING_NAME = "__groceryGodLabels"
+
+# Runs in the Main Panel document. Installing twice is a no-op that flushes the
+# labels on the page, so it doubles as a catch-up poll.
+STREAM_JS = """
+(root, [binding, selector, scrollMs]) => {
+  if (window.__groceryGodStream) return window.__groceryGodStream.flush();
+
+  const seen = new Set();
+  const collect = (node, batch) => {
+    if (node.nodeType !== Node.ELEMENT_NODE) return;
+    const nodes = node.matches(selector) ? [node] : [];
+    nodes.push(...node.querySelectorAll(selector));
+    for (const n of nodes) {
+      const label = n.getAttribute('aria-label');
+      if (label && !seen.has(label)) {
+        seen.add(label);
+        batch.push(label);
+      }
+    }
+  };
+  const send = batch => { if (batch.length) window[binding](batch); };
+  const flush = () => {
+    const batch = [];
+    collect(document.documentElement, batch);
+    send(batch);
+    return seen.size;
+  };
+
+  const observer = new MutationObserver(records => {
+    const batch = [];
+    for (const record of records) {
+      if (record.type === 'attributes') collect(record.target, batch);
+      else record.addedNodes.forEach(node => collect(node, batch));
+    }
+    send(batch);
+  });
+  observer.observe(document, {
+    childList: true, subtree: true, attributes: true, attributeFilter: ['aria-label'],
+  });
+
+  const scroller = document.scrollingElement || document.documentElement;
+  const timer = scrollMs ? setInterval(() => scroller.scrollBy(0, window.innerHeight), scrollMs) : null;
+
+  window.__groceryGodStream = {
+    flush,
+    stop: () => { observer.disconnect(); if (timer) clearInterval(timer); },
+  };
+  return flush();
+}
+"""
+
+STOP_JS = "() => window.__groceryGodStream && window.__groceryGodStream.stop()"
+
+
+class LabelStream:
+
+    def __init__(
+        self,
+        on_labels: Optional[Callable[[List[str]], None]] = None,
+        stable_ms: int = 2_000,
+        scroll_ms: int = 250,
+    ):
+        self.on_labels = on_labels
+        self.stable_ms = stable_ms
+        self.scroll_ms = scroll_ms
+
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget every label, for a new scrape; scrape_safeway calls this when it starts."""
+
+        self.labels: List[str] = []
+        self.batches = 0
+        self._seen = set()
+        self._last_new: Optional[float] = None
+
+    def attach(self, page: Page) -> None:
+        """
+        Expose the binding on every frame of `page`; once per page, before observing.
+        Labels read from an earlier page of the same scrape are kept (and not sent to on_labels
+        again), but the stability window restarts, so the new page has to settle on its own.
+        """
+
+        page.expose_binding(BINDING_NAME, self._receive)
+        self._last_new = None
+
+    def _receive(self, source, batch: List[str]) -> None:
+        new = []
+        for label in batch:
+            if label not in self._seen:
+                self._seen.add(label)
+                new.append(label)
+        if not new:
+            return
+
+        self.labels.extend(new)
+        self.batches += 1
+        self._last_new = time.monotonic()
+
+        if self.on_labels is not None:
+            self.on_labels(new)
+
+    def observe(self, frame: FrameLocator, selector: str) -> int:
+        """Install the observer in the frame (or catch up if installed); returns the labels seen there."""
+
+        if self._last_new is None:
+            self._last_new = time.monotonic()
+        return frame.locator(":root").evaluate(STREAM_JS, [BINDING_NAME, selector, self.scroll_ms])
+
+    def settled(self) -> bool:
+        """True once labels have arrived and none has been new for stable_ms on the current page."""
+
+        return (
+            bool(self.labels)
+            and self._last_new is not None
+            and time.monotonic() - self._last_new >= self.stable_ms / 1000
+        )
+
+    def stop(self, frame: FrameLocator) -> None:
+        try:
+            frame.locator(":root").evaluate(STOP_JS)
+        except PlaywrightError as e:
+            logging.debug("Label stream did not stop cleanly: %s", e)
@@ -0,0 +1,41 @@
+-- Natural keys behind the idempotent upserts of grocery_god.db.database.upload_clean_data:
+--   flyers         ON CONFLICT (store, valid_from, valid_until)
+--   flyer_products ON CONFLICT (flyer_id, product, deal, price)
+-- Existing duplicates are merged first, or the unique indexes cannot be built.
+
+begin;
+
+-- Point products of duplicate flyers at the oldest flyer of each week, then drop the rest
+with keep as (
+  select flyer_id, min(flyer_id) over (partition by store, valid_from, valid_until) as keep_id
+  from flyers
+)
+update flyer_products p
+set flyer_id = keep.keep_id
+from keep
+where p.flyer_id = keep.flyer_id
+  and keep.flyer_id <> keep.keep_id;
+
+delete from flyers f
+using flyers k
+where f.store = k.store
+  and f.valid_from = k.valid_from
+  and f.valid_until = k.valid_until
+  and f.flyer_id > k.flyer_id;
+
+-- Keep one row per product key; most products have no deal, so NULLs compare equal
+delete from flyer_products a
+using flyer_products b
+where a.ctid > b.ctid
+  and a.flyer_id = b.flyer_id
+  and a.product is not distinct from b.product
+  and a.deal is not distinct from b.deal
+  and a.price is not distinct from b.price;
+
+create unique index if not exists flyers_store_valid_from_valid_until_key
+  on flyers (store, valid_from, valid_until);
+
+create unique index if not exists flyer_products_flyer_id_product_deal_price_key
+  on flyer_products (flyer_id, product, deal, price) nulls not distinct;
+
+commit;
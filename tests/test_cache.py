@@ -0,0 +1,35 @@
+from pathlib import Path
+
+import pytest
+
+from grocery_god.benchmarks.synthetic import write_flyer
+from grocery_god.cleaning.cache import LabelCache
+from grocery_god.pipelines.reprocess import write_clean_flyer
+
+
+@pytest.mark.parametrize("chunksize", [50_000, 250])
+def test_cached_output_matches_uncached(tmp_path, chunksize):
+    path = write_flyer(str(tmp_path / "weeklyad_2025-01-01.csv"), 3_000, seed=1)
+    expected = Path(write_clean_flyer(path, str(tmp_path / "uncached"), chunksize)).read_bytes()
+
+    cache = LabelCache(str(tmp_path / "labels.sqlite"))
+    try:
+        cold = write_clean_flyer(path, str(tmp_path / "cold"), chunksize, cache=cache)
+        warm = write_clean_flyer(path, str(tmp_path / "warm"), chunksize, cache=cache)
+        stats = cache.stats()
+    finally:
+        cache.close()
+
+    assert stats["memory_hits"] > 0
+    assert Path(cold).read_bytes() == expected
+    assert Path(warm).read_bytes() == expected
+
+    # A fresh process only has the on-disk layer
+    cache = LabelCache(str(tmp_path / "labels.sqlite"))
+    try:
+        disk = write_clean_flyer(path, str(tmp_path / "disk"), chunksize, cache=cache)
+        assert cache.stats()["disk_hits"] > 0
+    finally:
+        cache.close()
+
+    assert Path(disk).read_bytes() == expected
@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from grocery_god.cleaning.cleaner import clean_data
+
+
+def _clean(deal: str, price: str) -> dict:
+    df = pd.DataFrame({"product": ["lucerne large eggs"], "deal": [deal], "price": [price]})
+    return clean_data(df).iloc[0].to_dict()
+
+
+@pytest.mark.parametrize(
+    "deal, price, deal_type, buy_qty, free_qty, effective_unit_price",
+    [
+        ("buy 2 get 1 free", "3.00", "buy_get_free", 2, 1, 2.00),
+        ("buy 1 get 1 free equal or lesser value", "2.00", "buy_get_free", 1, 1, 1.00),
+        ("buy 2 get 1 free member price", "3.00", "buy_get_free", 2, 1, 2.00),
+        ("get 2 free when you buy 3", "3.49", "get", 3, 2, 2.09),
+        ("free item when you buy 2", "4.00", "free", 2, 1, 2.67),
+        ("get 1 free", "2.00", "get", None, 1, 2.00),
+        ("buy 2 when you buy 2", "5.99", "buy", 2, None, 5.99),
+        ("earn 2x points when you buy 3", "1.00", "earn", 3, None, 1.00),
+        ("", "2 for 5", None, None, None, 2.50),
+    ],
+)
+def test_effective_unit_price(deal, price, deal_type, buy_qty, free_qty, effective_unit_price):
+    row = _clean(deal, price)
+
+    assert row["deal_type"] == deal_type
+    assert row["buy_qty"] == buy_qty
+    assert row["free_qty"] == free_qty
+    assert row["effective_unit_price"] == pytest.approx(effective_unit_price)
+
+
+def test_spend_threshold():
+    row = _clean("spend $50 get $10 off", "1.00")
+
+    assert row["deal_type"] == "spend"
+    assert row["threshold"] == 50.0
+    assert row["effective_unit_price"] == 1.00
+
+
+def test_when_you_buy_sets_units():
+    row = _clean("get 2 free when you buy 3", "3.49")
+
+    assert row["deal"] == "get 2 free"
+    assert row["units"] == 3
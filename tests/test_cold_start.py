@@ -0,0 +1,7 @@
+from grocery_god.benchmarks.cold_start import BUDGET_S, HANDLER_MODULE, check
+
+
+def test_handler_import_within_budget():
+    probe, _, failures = check(HANDLER_MODULE, BUDGET_S, repeat=3)
+
+    assert not failures, f"{failures} (best import {probe['seconds']:.3f}s)"
@@ -0,0 +1,35 @@
+from grocery_god.benchmarks.synthetic import make_labels
+from grocery_god.db.columnar import export_scrape, read_clean, read_raw
+from grocery_god.pipelines import fanout, safeway
+from grocery_god.scraping.safeway_async import ScrapeTarget
+
+WEEK = ("2025-01-01", "2025-01-07")
+
+
+def test_stores_of_the_same_week_keep_their_own_partitions(tmp_path):
+    raw_root, clean_root = str(tmp_path / "raw"), str(tmp_path / "clean")
+    labels = {"store-1": make_labels(1_200, 1).tolist(), "store-2": make_labels(800, 2).tolist()}
+
+    for store, store_labels in labels.items():
+        export_scrape(store_labels, *WEEK, raw_root, clean_root, store=store, grammar="safeway")
+
+    for store, store_labels in labels.items():
+        raw = read_raw(raw_root, store=store)
+        assert raw.sort_values("position")["label"].tolist() == store_labels
+        assert not read_clean(clean_root, store=store).empty
+
+
+def test_fanout_targets_export_the_same_week(tmp_path, monkeypatch):
+    labels = {
+        "https://a.test/": make_labels(1_200, 1).tolist(),
+        "https://b.test/": make_labels(800, 2).tolist(),
+    }
+    monkeypatch.setattr(safeway, "scrape_weekly_ad", lambda url: (labels[url], *WEEK))
+
+    targets = [ScrapeTarget("store-1", "https://a.test/"), ScrapeTarget("store-2", "https://b.test/")]
+    for target in targets:
+        fanout.run_target_pipeline(target, str(tmp_path), parquet=True)
+
+    for target in targets:
+        raw = read_raw(str(tmp_path / target.name / "parquet" / "raw"), store=target.name)
+        assert len(raw) == len(labels[target.url])
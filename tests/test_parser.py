@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+from grocery_god.benchmarks.synthetic import make_labels, write_flyer
+from grocery_god.parsing.grammar import get_grammar
+from grocery_god.parsing.parser import iter_setup_df, setup_df, sort_data, sort_row
+
+EDGE_LABELS = [
+    "Lucerne Large Eggs 12 ct, , $2.99 ea",
+    "LUCERNE LARGE EGGS, BUY 2 GET 1 FREE, $3.49",
+    "Tide Detergent, $1.50 off , $12.99",
+    "Fuji Apples",
+    "Fuji Apples, , ",
+    "",
+    "  spaced   label ,  save $2.00 ,  $4.99 lb ",
+    "Soda 12 pk, 2 for $5, 2 for $5",
+    "Cereal, buy 2, get 1 free, $3",
+    "Cereal, buy 2, buy 3, $4.50",
+    "Cereal, get 1, buy 2, get 3 free, $5",
+    "Cereal, buy 2, get 1, free, $3",
+]
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_vectorized_matches_loop(seed):
+    raw_data = make_labels(5_000, seed)
+
+    loop = sort_data(raw_data)
+    vectorized = sort_data(raw_data, vectorized=True)
+
+    assert len(vectorized[0]) == len(loop[0])
+    for row, (expected, actual) in enumerate(zip(zip(*loop), zip(*vectorized))):
+        assert actual == expected, f"row {row}"
+
+
+def test_vectorized_matches_loop_on_edge_labels():
+    raw_data = pd.Series(EDGE_LABELS, name="Raw Data")
+
+    assert sort_data(raw_data, vectorized=True) == sort_data(raw_data)
+
+
+@pytest.mark.parametrize(
+    "label, expected",
+    [
+        ("x, buy 2, get 1 free, $3", ("x, buy 2", "get 1 free", "$3")),
+        ("x, buy 2, buy 3, $4", ("x, buy 2", "buy 3", "$4")),
+        ("x, buy 2 get 1 free, $3", ("x", "buy 2 get 1 free", "$3")),
+        ("x, buy 2, get 1, free, $3", None),
+    ],
+)
+def test_sort_row_falls_back_to_later_keyword(label, expected):
+    assert sort_row(label, get_grammar("safeway")) == expected
+
+
+def test_setup_df_modes_match(tmp_path):
+    path = write_flyer(str(tmp_path / "weeklyad_2025-01-01.csv"), 3_000, seed=4)
+
+    loop = setup_df(path)
+    pd.testing.assert_frame_equal(setup_df(path, vectorized=True), loop)
+    pd.testing.assert_frame_equal(
+        pd.concat(iter_setup_df(path, chunksize=700), ignore_index=True), loop
+    )
@@ -0,0 +1,100 @@
+import gzip
+from pathlib import Path
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+from moto import mock_aws
+
+from grocery_god.pipelines import safeway, safeway_lambda
+from grocery_god.pipelines.change_detection import HASH_METADATA_KEY, content_hash, s3_content_hash
+from grocery_god.pipelines.s3_export import scrape_to_s3
+from grocery_god.scraping.safeway import scrape_to_csv
+
+BUCKET = "grocery-god-test"
+PRODUCTS = [
+    "Lucerne Large Eggs 12 ct, , $2.99 ea",
+    'Signature Select "Family Size" Chips, buy 2 get 1 free, $4.99',
+    "Crème Fraîche 8 oz, , $3.49",
+]
+WEEK = ("2025-01-01", "2025-01-07")
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN"):
+        monkeypatch.setenv(name, "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.delenv("AWS_ENDPOINT_URL", raising=False)
+
+    with mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def csv_bytes(tmp_path):
+    return Path(scrape_to_csv(PRODUCTS, *WEEK, output_path=str(tmp_path))).read_bytes()
+
+
+@pytest.mark.parametrize("multipart_threshold", [None, 1])
+@pytest.mark.parametrize("compress", [False, True])
+def test_upload_matches_local_csv(s3, csv_bytes, compress, multipart_threshold):
+    options = {} if multipart_threshold is None else {"multipart_threshold": multipart_threshold}
+    digest = content_hash(PRODUCTS, *WEEK)
+
+    upload = scrape_to_s3(
+        s3, PRODUCTS, *WEEK, BUCKET, "safeway/weeklyad.csv",
+        compress=compress, metadata={HASH_METADATA_KEY: digest}, **options,
+    )
+
+    obj = s3.get_object(Bucket=BUCKET, Key="safeway/weeklyad.csv")
+    body = obj["Body"].read()
+    assert upload["bytes"] == len(body)
+    assert (gzip.decompress(body) if compress else body) == csv_bytes
+    assert obj.get("ContentEncoding") == ("gzip" if compress else None)
+    assert obj["Metadata"] == {HASH_METADATA_KEY: digest}
+    assert s3_content_hash(s3, BUCKET, "safeway/weeklyad.csv") == digest
+
+
+def test_missing_key_has_no_hash(s3):
+    assert s3_content_hash(s3, BUCKET, "safeway/missing.csv") is None
+
+
+def test_denied_head_counts_as_missing(s3, caplog):
+    with Stubber(s3) as stubber:
+        stubber.add_client_error("head_object", service_error_code="403", http_status_code=403)
+        assert s3_content_hash(s3, BUCKET, "safeway/weeklyad.csv") is None
+    assert "denied" in caplog.text
+
+
+def test_other_head_errors_raise(s3):
+    with Stubber(s3) as stubber:
+        stubber.add_client_error("head_object", service_error_code="500", http_status_code=500)
+        with pytest.raises(s3.exceptions.ClientError):
+            s3_content_hash(s3, BUCKET, "safeway/weeklyad.csv")
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_handler_skips_unchanged_ad(s3, csv_bytes, monkeypatch, compress):
+    monkeypatch.setattr(safeway, "scrape_weekly_ad", lambda: (PRODUCTS, *WEEK))
+    monkeypatch.setattr(safeway_lambda, "BUCKET", BUCKET)
+    monkeypatch.setattr(safeway_lambda, "PREFIX", "safeway/")
+    monkeypatch.setattr(safeway_lambda, "COMPRESS", compress)
+    safeway_lambda.get_s3.cache_clear()
+
+    try:
+        first = safeway_lambda.handler({}, None)
+        second = safeway_lambda.handler({}, None)
+    finally:
+        safeway_lambda.get_s3.cache_clear()
+
+    key = "safeway/weeklyad_2025-01-01.csv" + (".gz" if compress else "")
+    body = s3.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+    assert (gzip.decompress(body) if compress else body) == csv_bytes
+
+    assert first["key"] == second["key"] == key
+    assert first["unchanged"] is False and first["bytes"] == len(body)
+    assert second["unchanged"] is True and second["bytes"] == 0
+    assert second["content_hash"] == first["content_hash"] == content_hash(PRODUCTS, *WEEK)
@@ -0,0 +1,101 @@
+import time
+
+from grocery_god.scraping.streaming import BINDING_NAME, LabelStream
+
+
+class FakePage:
+
+    def __init__(self):
+        self.bindings = {}
+
+    def expose_binding(self, name, callback):
+        self.bindings[name] = callback
+
+
+class FakeFrame:
+
+    def __init__(self):
+        self.calls = []
+
+    def locator(self, selector):
+        return self
+
+    def evaluate(self, expression, arg=None):
+        self.calls.append(arg)
+        return 0
+
+
+def _attached(**kwargs) -> tuple[LabelStream, callable]:
+    stream = LabelStream(**kwargs)
+    page = FakePage()
+    stream.attach(page)
+    return stream, page.bindings[BINDING_NAME]
+
+
+def test_dedupes_within_and_across_batches():
+    batches = []
+    stream, send = _attached(on_labels=batches.append)
+
+    send(None, ["eggs", "milk", "eggs"])
+    send(None, ["milk", "bread"])
+    send(None, ["bread"])
+
+    assert stream.labels == ["eggs", "milk", "bread"]
+    assert batches == [["eggs", "milk"], ["bread"]]
+    assert stream.batches == 2
+
+
+def test_settles_after_stable_interval():
+    stream, send = _attached(stable_ms=50)
+    stream.observe(FakeFrame(), "sfml-flyer-image-a[aria-label]")
+
+    assert not stream.settled()  # no labels yet
+
+    send(None, ["eggs"])
+    assert not stream.settled()
+
+    time.sleep(0.03)
+    send(None, ["milk"])  # a new label restarts the window
+    time.sleep(0.03)
+    assert not stream.settled()
+
+    time.sleep(0.03)
+    assert stream.settled()
+
+
+def test_repeated_labels_do_not_restart_window():
+    stream, send = _attached(stable_ms=50)
+    send(None, ["eggs"])
+
+    time.sleep(0.06)
+    send(None, ["eggs"])
+
+    assert stream.settled()
+
+
+def test_reset_forgets_labels():
+    stream, send = _attached(stable_ms=0)
+    send(None, ["eggs"])
+    assert stream.settled()
+
+    stream.reset()
+
+    assert stream.labels == [] and not stream.settled()
+    send(None, ["eggs"])
+    assert stream.labels == ["eggs"]
+
+
+def test_new_page_restarts_window_but_keeps_labels():
+    batches = []
+    stream, send = _attached(on_labels=batches.append, stable_ms=50)
+    send(None, ["eggs"])
+    time.sleep(0.06)
+    assert stream.settled()
+
+    page = FakePage()
+    stream.attach(page)
+
+    assert not stream.settled()
+    page.bindings[BINDING_NAME](None, ["eggs", "milk"])
+    assert stream.labels == ["eggs", "milk"]
+    assert batches == [["eggs"], ["milk"]]